@@ -17,7 +17,7 @@ setup(
     author_email='ivan.rincon76@gmail.com',
     url="https://github.com/Arg0s1080/statux",
     keywords="linux stats monitoring sensors proc sys battery cpu disk net ram hardware "
-             "cpuinfo diskstats meminfo mounts partitions power_supply thermal temp",
+             "cpuinfo diskstats meminfo vmstat numa mounts partitions power_supply thermal temp hwmon fan voltage",
     packages=["statux"],
     classifiers=[
         "Development Status :: 3 - Alpha",
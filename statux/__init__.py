@@ -16,3 +16,5 @@
 __author__  = "Ivan Rincon"
 __license__ = "GPLv3"
 __version__ = "0.1.2"
+
+from statux._reader import close
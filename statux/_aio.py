@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+import asyncio
+
+# Cache:
+_pending = {}  # (event loop, source, interval) -> task
+
+
+async def _read_pair(get_stat, interval: float) -> tuple:
+    old_stat = get_stat()
+    await asyncio.sleep(interval)
+    return old_stat, get_stat(), interval
+
+
+async def shared_pair(source: str, get_stat, interval: float) -> tuple:
+    """ Returns a tuple (old_stat, new_stat, elapsed) with two reads separated by interval seconds
+
+        :Params:
+            :source    (str): Name of the data source (e.g.: '/proc/stat'). It's the key to share reads
+            :get_stat (func): Function that reads the data source
+            :interval (float): Seconds between reads
+
+
+    Concurrent awaiters asking for the same source and interval share the same pair of reads. The
+    reads are shielded, so cancelling one awaiter doesn't cancel them for the others.
+    """
+    loop = asyncio.get_running_loop()
+    key = loop, source, interval
+    task = _pending.get(key)
+    if task is None:
+        task = _pending[key] = loop.create_task(_read_pair(get_stat, interval))
+        task.add_done_callback(lambda _: _pending.pop(key, None))
+    return await asyncio.shield(task)
@@ -106,3 +106,27 @@ def set_celsius(degrees: float, scale: str, precision: int) -> float:
     else:
         raise UnsupportedScaleError(scale)
     return round(r, precision)
+
+
+def _set_unit(value: float, scale: str, precision: int, scales: dict) -> float:
+    # scales: dict with lower case scales as keys and divisors of the input value as values
+    try:
+        return round(value / scales[scale.lower()], precision)  # Case insensitive
+    except KeyError:
+        raise UnsupportedScaleError(scale)
+
+
+def set_volts(millivolts: float, scale: str, precision: int) -> float:
+    return _set_unit(millivolts, scale, precision, {"v": 1000, "mv": 1})
+
+
+def set_amperes(milliamperes: float, scale: str, precision: int) -> float:
+    return _set_unit(milliamperes, scale, precision, {"a": 1000, "ma": 1})
+
+
+def set_watts(microwatts: float, scale: str, precision: int) -> float:
+    return _set_unit(microwatts, scale, precision, {"w": 10**6, "mw": 1000, "uw": 1})
+
+
+def set_joules(microjoules: float, scale: str, precision: int) -> float:
+    return _set_unit(microjoules, scale, precision, {"j": 10**6, "kj": 10**9, "wh": 3.6 * 10**9, "uj": 1})
@@ -14,6 +14,7 @@
 # (ɔ) Iván Rincón 2019
 
 import errno
+from inspect import iscoroutinefunction
 from sys import platform
 from os import strerror
 from os.path import basename
@@ -116,20 +117,28 @@ class UnsupportedScaleError(ValueError, StatuxError):
 
 def ex_handler(filename, value=""):
     def raiser(fun):
+        def convert(ex: Exception) -> Exception:
+            # Returns the exception to be raised instead of ex
+            name = value or fun.__name__.replace("_", " ")
+            if isinstance(ex, UnexpectedValueError):
+                return ex
+            if isinstance(ex, FileNotFoundError):
+                return ValueNotFoundError(name, filename, errno.ENOENT, msg=strerror(errno.ENOENT))
+            msg = "%s: %s" % (strerror(errno.ENOMSG), ex.args[0])
+            return ValueNotFoundError(name, filename, errno.ENOMSG, msg=msg)
+
         def wrapper(*args, **kwargs):
-            def get_name():
-                # Returns method name
-                return fun.__name__.replace("_", " ")
             try:
                 return fun(*args, **kwargs)
-            except UnexpectedValueError:
-                raise
-            except FileNotFoundError:
-                raise ValueNotFoundError(value or get_name(), filename, errno.ENOENT, msg=strerror(errno.ENOENT))
-            except ValueError as ex:
-                msg = "%s: %s" % (strerror(errno.ENOMSG), ex.args[0])
-                raise ValueNotFoundError(value or get_name(), filename, errno.ENOMSG, msg=msg)
-        return wrapper
+            except (FileNotFoundError, ValueError) as ex:
+                raise convert(ex)
+
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await fun(*args, **kwargs)
+            except (FileNotFoundError, ValueError) as ex:
+                raise convert(ex)
+        return async_wrapper if iscoroutinefunction(fun) else wrapper
     return raiser
 
 
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+# Minimal inotify client through libc (there isn't inotify support in the standard library)
+
+import ctypes
+import ctypes.util
+from os import read, close as os_close, O_CLOEXEC, O_NONBLOCK, strerror
+from struct import Struct
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_CHANGES = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT = Struct("=iIII")  # watch descriptor, mask, cookie, name length
+_BUFFER_SIZE = 65536
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    return _libc
+
+
+class Inotify:
+    """ Non-blocking inotify instance
+
+    Raises OSError if inotify is not available (e.g.: max_user_instances reached)
+    """
+    def __init__(self):
+        self._fd = -1
+        try:
+            libc = _get_libc()
+            init = libc.inotify_init1
+            self._add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError) as ex:
+            raise OSError("inotify not available: %s" % ex)
+        self._fd = init(O_NONBLOCK | O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, strerror(err))
+        self.watches = {}  # watch descriptor -> path
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def add_watch(self, path: str, mask=IN_CHANGES) -> int:
+        wd = self._add_watch(self._fd, path.encode(), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, strerror(err), path)
+        self.watches[wd] = path
+        return wd
+
+    def events(self):
+        """Yields (path, mask, name) of every pending event"""
+        while True:
+            try:
+                data = read(self._fd, _BUFFER_SIZE)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                yield self.watches.get(wd), mask, name
+
+    def close(self):
+        if self._fd >= 0:
+            os_close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, AttributeError):
+            pass
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+from os import pipe, write as os_write, close as os_close
+from select import select
+from threading import Lock, Thread
+from statux._errors import UnexpectedValueError
+
+
+class Monitor:
+    """ Base of the classes that keep an in-memory state up to date with kernel notifications
+
+    Callbacks can be registered for the events in _EVENTS with on(). If start() is called,
+    notifications are processed in a background thread (callbacks are called from it, and if it
+    fails, its exception is raised by the next call to update()). Otherwise, pending notifications
+    are processed on every call to update(). Callbacks are called without holding the lock of the
+    monitor, so they can read its state. It can be used as a context manager.
+
+    Subclasses set _EVENTS and _THREAD_NAME, keep their netlink socket (or None) in _socket and
+    implement _receive(), which processes the pending notifications without blocking.
+    """
+    _EVENTS = ()
+    _THREAD_NAME = "statux-monitor"
+    _socket = None
+
+    def __init__(self):
+        self._callbacks = {event: [] for event in self._EVENTS}
+        self._events = []  # (event, record) to be notified once the lock is released
+        self._lock = Lock()
+        self._thread = None
+        self._wakeup = None
+        self._error = None  # Exception that stopped the background thread
+
+    def on(self, event: str, callback):
+        """ Registers a callback for an event
+
+            :Params:
+                :event     (str): One of _EVENTS
+                :callback (func): Function called with the changed record as argument
+
+        """
+        if event not in self._callbacks:
+            raise UnexpectedValueError("Unsupported event", event, self._EVENTS)
+        self._callbacks[event].append(callback)
+
+    def _notify(self, event: str, record):
+        self._events.append((event, record))
+
+    def _dispatch(self):
+        # Calls the callbacks of the queued events. It must be called without holding the lock
+        with self._lock:
+            events, self._events = self._events, []
+        for event, record in events:
+            for callback in self._callbacks[event]:
+                callback(record)
+
+    def _receive(self):
+        raise NotImplementedError
+
+    def _wait_time(self):
+        # Seconds the background thread waits for notifications before calling _receive() anyway
+        return None
+
+    def update(self):
+        """Processes pending notifications without blocking"""
+        if self._thread is None:
+            self._receive()
+        elif self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            while True:
+                fds = [self._wakeup[0]] + ([self._socket] if self._socket is not None else [])
+                if self._wakeup[0] in select(fds, [], [], self._wait_time())[0]:
+                    return
+                self._receive()
+        except Exception as ex:  # Raised by the next update()
+            self._error = ex
+
+    def start(self):
+        """Starts processing notifications in a background thread"""
+        if self._thread is None:
+            self._error = None
+            self._wakeup = pipe()
+            self._thread = Thread(target=self._run, name=self._THREAD_NAME, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background thread"""
+        if self._thread is not None:
+            os_write(self._wakeup[1], b"\0")
+            self._thread.join()
+            for fd in self._wakeup:
+                os_close(fd)
+            self._thread = self._wakeup = None
+
+    def close(self):
+        self.stop()
+        self._socket is not None and self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+# Minimal rtnetlink and kobject uevent clients. Only the local kernel is queried (pid 0)
+
+import socket
+from struct import Struct
+from errno import ENOBUFS
+from os import strerror
+
+NETLINK_ROUTE = 0
+NETLINK_KOBJECT_UEVENT = 15
+RTMGRP_LINK = 1  # RTNLGRP_LINK multicast group bitmask
+UEVENT_KERNEL = 1  # Kernel uevents multicast group (2 is used by udev)
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_DUMP = 0x300
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_OPERSTATE = 16
+IFLA_STATS64 = 23
+
+_NLMSGHDR = Struct("=LHHLL")    # length, type, flags, sequence, port id
+_IFINFOMSG = Struct("=BxHiII")  # family, type, index, flags, change
+_RTATTR = Struct("=HH")         # length, type
+_ERROR = Struct("=i")
+_BUFFER_SIZE = 65536
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def attributes(data: memoryview, offset: int, end: int) -> dict:
+    # -> dict: keys = attribute types, values = memoryview of the payload
+    res = {}
+    while offset + _RTATTR.size <= end:
+        length, type_ = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        res[type_ & 0x3fff] = data[offset + _RTATTR.size:offset + length]  # Removing NLA_F_* flags
+        offset += _align(length)
+    return res
+
+
+def messages(data: memoryview, size: int):
+    # Yields (type, flags, sequence, payload offset, end) of every message in data
+    offset = 0
+    while offset + _NLMSGHDR.size <= size:
+        length, type_, flags, seq, pid = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        yield type_, flags, seq, offset + _NLMSGHDR.size, offset + length
+        offset += _align(length)
+
+
+class RouteSocket:
+    """ NETLINK_ROUTE socket to dump network links
+
+            :Params:
+                :groups (int): Multicast groups bitmask to subscribe to (e.g.: RTMGRP_LINK = 1)
+
+
+    The receive buffer is reused, so the attributes yielded are only valid until the next iteration.
+    A RouteSocket is not thread safe: callers sharing one must serialize the dumps.
+    """
+    def __init__(self, groups=0):
+        self.groups = groups
+        self._socket = self._open(groups)
+        self._buffer = bytearray(_BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._seq = 0
+
+    @staticmethod
+    def _open(groups: int) -> socket.socket:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, NETLINK_ROUTE)
+        try:
+            sock.bind((0, groups))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _reopen(self):
+        # Discards everything queued in the socket (e.g.: the rest of a broken dump)
+        self._socket.close()
+        self._socket = self._open(self.groups)
+
+    def fileno(self) -> int:
+        return self._socket.fileno()
+
+    def _recv(self, flags=0) -> int:
+        return self._socket.recv_into(self._buffer, 0, flags)
+
+    def links(self, size: int, seq=0):
+        # Yields (message type, ifinfomsg tuple, attributes) of every link message in the buffer.
+        # Notifications (sequence 0) and replies to the request with sequence seq are processed,
+        # replies to previous requests are skipped
+        for type_, flags, seq_, offset, end in messages(self._view, size):
+            if seq_ and seq_ != seq:
+                continue
+            if type_ == NLMSG_ERROR:
+                err = -_ERROR.unpack_from(self._view, offset)[0]
+                if err:
+                    raise OSError(err, strerror(err))
+            elif type_ in (RTM_NEWLINK, RTM_DELLINK):
+                ifi = _IFINFOMSG.unpack_from(self._view, offset)
+                yield type_, ifi, attributes(self._view, offset + _IFINFOMSG.size, end)
+
+    def _is_done(self, size: int, seq: int) -> bool:
+        # True if the buffer has the end (NLMSG_DONE or an error) of the dump with sequence seq
+        return any(type_ in (NLMSG_DONE, NLMSG_ERROR) and seq_ == seq
+                   for type_, flags, seq_, offset, end in messages(self._view, size))
+
+    def _drain(self, seq: int):
+        # Reads the rest of an unfinished dump, so it can't be mixed with the next one
+        try:
+            while not self._is_done(self._recv(), seq):
+                pass
+        except OSError:
+            self._reopen()
+
+    def dump_links(self):
+        """Yields (message type, ifinfomsg tuple, attributes) of every network link
+
+        If the dump is not read to the end, the remaining replies are drained when the generator is
+        closed. If it fails, the socket is opened again.
+        """
+        self._seq += 1
+        seq = self._seq
+        request = _NLMSGHDR.pack(_NLMSGHDR.size + _IFINFOMSG.size, RTM_GETLINK, NLM_F_REQUEST | NLM_F_DUMP,
+                                 seq, 0) + _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        done = False
+        try:
+            self._socket.sendto(request, (0, 0))
+            while not done:
+                size = self._recv()
+                done = self._is_done(size, seq)
+                yield from self.links(size, seq)
+        except GeneratorExit:
+            done or self._drain(seq)
+            raise
+        except BaseException:
+            self._reopen()
+            raise
+
+    def events(self, flags=0):
+        """Yields (message type, ifinfomsg tuple, attributes) of the messages received by one recv"""
+        yield from self.links(self._recv(flags))
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class UeventSocket:
+    """ NETLINK_KOBJECT_UEVENT socket subscribed to kernel uevents
+
+    It's non-blocking: events() yields the pending uevents and returns when there are no more.
+    """
+    def __init__(self):
+        self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC | socket.SOCK_NONBLOCK,
+                                     NETLINK_KOBJECT_UEVENT)
+        try:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            self._socket.bind((0, UEVENT_KERNEL))
+        except OSError:
+            self._socket.close()
+            raise
+        self._buffer = bytearray(_BUFFER_SIZE)
+        self.overflowed = False
+
+    def fileno(self) -> int:
+        return self._socket.fileno()
+
+    @staticmethod
+    def parse(data: bytes) -> dict:
+        # "add@/devices/...\0ACTION=add\0DEVPATH=/devices/...\0SUBSYSTEM=block\0..." -> dict
+        res = {}
+        for item in data.split(b"\0")[1:]:
+            key, sep, value = item.partition(b"=")
+            if sep:
+                res[key.decode()] = value.decode(errors="replace")
+        return res
+
+    def events(self):
+        """Yields a dict per pending uevent (ACTION, DEVPATH, SUBSYSTEM, etc)
+
+        If the socket buffer overflowed, some uevents have been lost and overflowed is set to True
+        """
+        while True:
+            try:
+                size = self._socket.recv_into(self._buffer)
+            except BlockingIOError:
+                return
+            except OSError as ex:
+                if ex.errno != ENOBUFS:
+                    raise
+                self.overflowed = True
+                continue
+            yield self.parse(bytes(self._buffer[:size]))
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
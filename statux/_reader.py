@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+from os import open as os_open, close as os_close, preadv, O_RDONLY, O_CLOEXEC
+from threading import Lock
+
+_BUFFER_SIZE = 4096
+
+# Cache:
+_readers = {}
+_lock = Lock()
+_close_hooks = []  # Functions that close the module caches holding descriptors (e.g.: mount table)
+
+
+class Reader:
+    """ Keeps a procfs/sysfs file open and re-reads it from offset 0
+
+            :Params:
+                :path (str): File path (e.g.: '/proc/stat')
+                :size (int): Initial buffer size in bytes. The buffer grows when the file doesn't fit
+
+
+    procfs and sysfs regenerate their content on every read at offset 0, so there is no need to
+    reopen the file each time. Reader can be used as a context manager to close the descriptor.
+
+    seq_file files (e.g.: /proc/self/mountinfo, /proc/net/dev, /proc/diskstats) return about one
+    page per read whatever the buffer size is, so the file is read until pread returns 0.
+    read_leading() stops as soon as the lines it needs have been read (e.g.: the cpu lines of
+    /proc/stat, without the long intr line).
+    """
+    def __init__(self, path: str, size=_BUFFER_SIZE):
+        self.path = path
+        self._fd = os_open(path, O_RDONLY | O_CLOEXEC)
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._lock = Lock()
+
+    def _read_chunk(self, total: int) -> int:
+        # Reads the next chunk after the first total bytes. Returns its size (0 at the end of file)
+        if self._fd is None:
+            raise ValueError("I/O operation on closed file %s" % self.path)
+        if total == len(self._buffer):  # The file doesn't fit. Buffer is doubled
+            buffer = bytearray(len(self._buffer) * 2)
+            buffer[:total] = self._view
+            self._view.release()
+            self._buffer, self._view = buffer, memoryview(buffer)
+        return preadv(self._fd, [self._view[total:]], total)
+
+    def read(self) -> bytes:
+        """Returns the whole content of the file"""
+        with self._lock:
+            total = 0
+            while True:
+                size = self._read_chunk(total)
+                if size == 0:
+                    return self._view[:total].tobytes()
+                total += size
+
+    def read_leading(self, prefix: bytes) -> bytes:
+        """Returns the lines at the beginning of the file that start with prefix. The rest isn't read"""
+        with self._lock:
+            total = end = 0  # end: end of the last complete line that starts with prefix
+            while True:
+                size = self._read_chunk(total)
+                total += size
+                while total - end >= len(prefix):
+                    if not self._buffer.startswith(prefix, end, total):
+                        return self._view[:end].tobytes()
+                    line_end = self._buffer.find(b"\n", end, total)
+                    if line_end == -1:
+                        break
+                    end = line_end + 1
+                if size == 0:  # Last line without newline
+                    return self._view[:total if self._buffer.startswith(prefix, end, total) else end].tobytes()
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os_close(self._fd)
+                self._fd = None
+
+    def fileno(self) -> int:
+        return self._fd
+
+    @property
+    def closed(self) -> bool:
+        return self._fd is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, AttributeError):
+            pass
+
+
+def get_reader(path: str) -> Reader:
+    """Returns the shared Reader of a path, opening it the first time"""
+    try:
+        return _readers[path]
+    except KeyError:
+        with _lock:
+            reader = _readers.get(path)
+            if reader is None:
+                reader = _readers[path] = Reader(path)
+            return reader
+
+
+def read(path: str) -> bytes:
+    """Returns the content of a file through its shared Reader
+
+    If the file has disappeared (e.g. a sysfs device was removed) the descriptor is discarded
+    and the file is opened again, so FileNotFoundError is raised if it doesn't exist anymore.
+    """
+    reader = get_reader(path)
+    try:
+        return reader.read()
+    except (OSError, ValueError):
+        discard(path)
+        return get_reader(path).read()
+
+
+def read_leading(path: str, prefix: bytes) -> bytes:
+    """Returns the lines at the beginning of a file that start with prefix (see Reader.read_leading)"""
+    reader = get_reader(path)
+    try:
+        return reader.read_leading(prefix)
+    except (OSError, ValueError):
+        discard(path)
+        return get_reader(path).read_leading(prefix)
+
+
+def read_once(path: str) -> bytes:
+    """Returns the content of a file without keeping it open. Useful for values that don't change"""
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def read_lines(path: str) -> list:
+    """Returns a list with the lines (bytes) of a file"""
+    return read(path).splitlines()
+
+
+def discard(*paths: str):
+    """Closes the shared Readers of the given paths"""
+    with _lock:
+        for path in paths:
+            reader = _readers.pop(path, None)
+            reader is not None and reader.close()
+
+
+def discard_missing(parent: str, names):
+    """Closes the shared Readers of the files under parent/<name>/ whose name isn't in names
+
+    Used to release the descriptors of devices that have disappeared (e.g.: an unplugged power
+    supply or an offlined cpufreq policy). Files directly under parent are kept.
+    """
+    names = set(names)
+    with _lock:
+        for path in [path for path in _readers if path.startswith(parent)]:
+            name, sep, _ = path[len(parent):].lstrip("/").partition("/")
+            if sep and name not in names:
+                _readers.pop(path).close()
+
+
+def on_close(function):
+    """Registers a function that close() calls to release a module cache. Usable as a decorator"""
+    _close_hooks.append(function)
+    return function
+
+
+def close():
+    """Closes every shared Reader and the module caches. They will be opened again on demand"""
+    with _lock:
+        while _readers:
+            _readers.popitem()[1].close()
+    for hook in _close_hooks:
+        hook()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+from time import monotonic, sleep
+from statux._aio import shared_pair
+
+
+class Sampler:
+    """ Base of the classes that compute deltas or rates between two reads of a data source
+
+            :Params:
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    Subclasses implement _get_stat(). Every instance keeps its own previous snapshot and timestamp,
+    so several instances (e.g. with different items or cadences) don't interfere with each other.
+
+    Async reads are shared by every awaiter of the same source and interval, whatever their
+    instance is. So subclasses that support them set _source (the key of the shared reads, e.g.:
+    '/proc/stat') and _read_all, a function that reads the data of every item.
+    """
+    _source = None
+    _read_all = None
+
+    def __init__(self, initialize=False):
+        self._last = None  # (stat, monotonic time)
+        initialize and self._get_pair(0.0)
+
+    def _get_stat(self):
+        raise NotImplementedError
+
+    def _set_last(self, new_stat):
+        self._last = new_stat, monotonic()
+
+    def _get_pair(self, interval: float) -> tuple:
+        # Returns a tuple (old stat, new stat, elapsed seconds) and keeps the new stat
+        if self._last is None or interval > 0.0:
+            old_stat = self._get_stat()
+            sleep(interval)
+            elapsed = interval
+        else:
+            old_stat, last_time = self._last
+            elapsed = monotonic() - last_time
+        new_stat = self._get_stat()
+        self._set_last(new_stat)
+        return old_stat, new_stat, elapsed
+
+    async def _aget_pair(self, interval: float) -> tuple:
+        # Like _get_pair, but concurrent awaiters with the same interval share the reads
+        if self._last is None or interval > 0.0:
+            old_stat, new_stat, elapsed = await shared_pair(self._source, type(self)._read_all, interval)
+            self._set_last(new_stat)
+            return old_stat, new_stat, elapsed
+        return self._get_pair(interval)
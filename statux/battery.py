@@ -13,82 +13,444 @@
 #
 # (ɔ) Iván Rincón 2019
 
-# NOTE: THIS CODE IS VALID FOR MOST LAPTOPS. IN CASE OF HAVING MORE THAN ONE SUPPLY,
-#       ONLY THE FIRST ONE WILL BE DETECTED
-
 from os import listdir
-from os.path import join
+from os.path import basename, join
+from time import monotonic
 from statux._errors import ValueNotFoundError, errno, strerror
+from statux._monitor import Monitor
+from statux._netlink import UeventSocket
+from statux._reader import read, discard, discard_missing
 
 
 _PARENT = "/sys/class/power_supply/"
 _UEVENT = "uevent"
 _UPOWER = "/etc/UPower/UPower.conf"
 _LID = "/proc/acpi/button/lid/"
-_PTH = None
+
+# Cache:
+_monitor = None
 
 
-def ex_handler(fun):
+def ex_handler(fun, path=_PARENT):
     def wrapper(*args, **kwargs):
         def get_name():
             # Returns method name
             return fun.__name__.replace("_", " ")
         error = None
         msg = None
+        filename = path
         try:
             return fun(*args, **kwargs)
-        except FileNotFoundError:
+        except FileNotFoundError as exc:
             error = errno.ENOENT
             msg = strerror(error)
+            filename = exc.filename or path
         except KeyError:
             error = errno.ENODATA
             msg = strerror(error)
-        except TypeError as exc:
-            error = errno.ENOMSG
-            msg = "%s: %s" % (strerror(errno.ENOMSG), exc.args[0])
-        except ValueError as exc:
+        except (TypeError, ValueError, ZeroDivisionError) as exc:
             error = errno.ENOMSG
             msg = "%s: %s" % (strerror(errno.ENOMSG), exc.args[0])
         finally:
             if error is not None:
-                raise ValueNotFoundError(get_name(), _PTH, err_no=error, msg=msg)
+                raise ValueNotFoundError(get_name(), filename, err_no=error, msg=msg)
     return wrapper
 
 
-def _get_stat(file: str, supply: str) -> list:
-    # supply: can be "BAT0", "BAT1", "ACAD", "UPS"...
-    global _PTH
-    supply_ = None
-    _PTH = _PARENT
-    # TODO: More than one supply support
-    for supply_ in [folder for folder in listdir(_PARENT)]:  # for supply in supplies
-        if supply_.startswith(supply):
-            break  # First supply is chosen
-    _PTH = join(_PARENT, supply_, file)
-    if supply_ is not None:
-        with open(_PTH, "r") as f:
-            return f.readlines()
-
-
-def _get_uevent(supply: str):
-    # supply: can be "BAT0", "BAT1", "ACAD", "UPS"...
-    file = _get_stat(_UEVENT, supply)
-    if file is not None:
-        for ln in file:
-            ln = ln.replace("POWER_SUPPLY_", "").split("=")
-            v = ln[1][:-1]
-            yield ln[0].lower(), v if not v.isdigit() else int(v)
+def _upower_ex_handler(fun):
+    return ex_handler(fun, _UPOWER)
+
+
+def _parse_fields(items) -> dict:
+    # (POWER_SUPPLY_VOLTAGE_NOW, 12552000) -> {"voltage_now": 12552000}
+    return {key[13:].lower(): int(value) if value.lstrip("-").isdigit() else value
+            for key, value in items if key.startswith("POWER_SUPPLY_")}
+
+
+def _parse_uevent(data: bytes) -> dict:
+    return _parse_fields(line.partition("=")[::2] for line in data.decode().splitlines())
+
+
+def _make_supply(name: str, fields: dict) -> "PowerSupply":
+    return _TYPES.get(fields.get("type"), Adapter)(name, fields)
+
+
+class PowerSupply:
+    """ A power supply of /sys/class/power_supply/ (battery, AC adapter, UPS, USB, etc)
+
+    Every field of its uevent file is available by its lower case name without the POWER_SUPPLY_
+    prefix (e.g.: supply["voltage_now"]). Values are in the units of the kernel (uV, uA, uW, uWh, uAh)
+    """
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def __getitem__(self, key: str):
+        return self.fields[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.fields
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.name)
+
+    @property
+    def type(self) -> str:
+        """'Battery', 'Mains', 'UPS', 'USB', etc"""
+        return self["type"]
+
+    @property
+    def online(self) -> bool:
+        return bool(self["online"])
+
+    @property
+    def present(self) -> bool:
+        return bool(self["present"])
+
+
+class Adapter(PowerSupply):
+    """AC adapter (Mains), USB or wireless power supply"""
+    __slots__ = ()
+
+
+class Battery(PowerSupply):
+    """ Battery. Properties use the units of the module functions (mV, mA, mW, mWh and mAh)
+
+    Some batteries only report charge (uAh) and others only energy (uWh), so missing values are
+    calculated with the voltage.
+    """
+    __slots__ = ()
+
+    @property
+    def status(self) -> str:
+        """'Full', 'Charging', 'Discharging', 'Not charging' or 'Unknown'"""
+        return self["status"]
+
+    @property
+    def capacity(self) -> int:
+        return self["capacity"]
+
+    @property
+    def capacity_level(self) -> str:
+        return self["capacity_level"]
+
+    @property
+    def technology(self) -> str:
+        return self["technology"]
+
+    @property
+    def voltage(self) -> int:
+        return round(self["voltage_now"] / 10**3)
+
+    @property
+    def current(self) -> int:
+        if "current_now" not in self:  # current value is not given, so let's try to get power and voltage
+            return round(self["power_now"] / self["voltage_now"] * 10**3)
+        return round(self["current_now"] / 10**3)
+
+    @property
+    def power(self) -> int:
+        if "current_now" not in self or "voltage_now" not in self:
+            return round(self["power_now"] / 10**3)
+        return round(self["voltage_now"] * self["current_now"] / 10**9)
+
+    @property
+    def energy(self) -> int:
+        if "energy_now" not in self:  # energy value is not given, so let's try to get voltage and charge
+            return round(self["voltage_now"] * self["charge_now"] / 10**9)
+        return round(self["energy_now"] / 10**3)
+
+    @property
+    def energy_full(self) -> int:
+        if "energy_full" not in self:
+            return round(self["voltage_now"] * self["charge_full"] / 10**9)
+        return round(self["energy_full"] / 10**3)
+
+    @property
+    def charge(self) -> int:
+        if "charge_now" not in self:  # charge value is not given...
+            return round(self["energy_now"] / self["voltage_now"] * 10**3)
+        return round(self["charge_now"] / 10**3)
+
+    @property
+    def remaining_time(self) -> float:
+        """Remaining seconds while discharging, inf otherwise"""
+        try:
+            dividend, divider, voltage_ = self["charge_now"], self["current_now"], self["voltage_now"]
+        except KeyError:
+            dividend, divider, voltage_ = self["energy_now"], self["power_now"], self["voltage_now"]
+        if self.status != "Discharging" or divider == 0:
+            return float("inf")
+        return round(dividend / divider * 3600)
+
+    @property
+    def wear_level(self) -> float:
+        """Health indicator of the battery (%). Less is better"""
+        try:  # Let's try to get charge values
+            full, design = self["charge_full"], self["charge_full_design"]
+        except KeyError:  # Charge values are not given, so let's try do it with energy values.
+            full, design = self["energy_full"], self["energy_full_design"]
+        return round(100 - (full / design * 100), 2)
+
+    @property
+    def info(self) -> dict:
+        """Manufacturer, model and serial number"""
+        return {
+            "Manufacturer":  self["manufacturer"],
+            "Model":         str(self["model_name"]),
+            "Serial Number": str(self["serial_number"])
+        }
+
+
+class Ups(Battery):
+    """Uninterruptible power supply"""
+    __slots__ = ()
+
+
+_TYPES = {"Battery": Battery, "UPS": Ups}  # Other types (Mains, USB, Wireless...) are adapters
+
+
+class PowerSupplies:
+    """ Snapshot of every power supply. Each uevent file is read and parsed once, when the snapshot
+    is created
+
+        :Attributes:
+            :supplies  (dict): Supply name -> Battery, Ups or Adapter
+            :batteries (list): Batteries sorted by name (BAT0, BAT1...)
+            :adapters  (list): AC adapters, USB supplies, etc
+            :ups       (list): UPS devices
+
+
+    Aggregate properties (capacity, energy, power, remaining_time...) take every battery into account.
+    They raise ValueNotFoundError if there isn't any battery
+
+        :Params:
+            :supplies (dict): Supply name -> PowerSupply. If it's None, /sys/class/power_supply is read
+    """
+    __slots__ = ("supplies", "batteries", "adapters", "ups")
+
+    def __init__(self, supplies=None):
+        if supplies is None:
+            supplies = {}
+            for name in listdir(_PARENT):
+                try:
+                    supplies[name] = _make_supply(name, _parse_uevent(read(join(_PARENT, name, _UEVENT))))
+                except FileNotFoundError:  # Unplugged while reading
+                    continue
+            discard_missing(_PARENT, supplies)  # Descriptors of unplugged supplies
+        self.supplies = {name: supplies[name] for name in sorted(supplies)}
+        self.batteries = [supply for supply in self.supplies.values() if type(supply) is Battery]
+        self.adapters = [supply for supply in self.supplies.values() if type(supply) is Adapter]
+        self.ups = [supply for supply in self.supplies.values() if type(supply) is Ups]
+
+    def __getitem__(self, name: str) -> PowerSupply:
+        return self.supplies[name]
+
+    @property
+    def battery(self) -> Battery:
+        """First battery (KeyError if there isn't any battery)"""
+        if not self.batteries:
+            raise KeyError("battery")
+        return self.batteries[0]
+
+    @property
+    def ac_online(self) -> bool:
+        """True if any Mains adapter is online"""
+        return any(adapter.online for adapter in self.adapters if adapter.fields.get("type") == "Mains")
+
+    @property
+    def status(self) -> str:
+        """'Discharging' if any battery is discharging, 'Charging' if any is charging, first status otherwise"""
+        statuses = [battery.status for battery in self.batteries]
+        for status_ in ("Discharging", "Charging"):
+            if status_ in statuses:
+                return status_
+        return statuses[0] if statuses else "Unknown"
+
+    def _require_batteries(self) -> list:
+        # Aggregates of an empty list (0 mWh, inf seconds...) would look like real values
+        if not self.batteries:
+            raise ValueNotFoundError("battery", _PARENT, errno.ENODEV)
+        return self.batteries
+
+    @property
+    def energy(self) -> int:
+        """Energy of all batteries (mWh)"""
+        return sum(battery.energy for battery in self._require_batteries())
+
+    @property
+    def energy_full(self) -> int:
+        """Energy of all batteries when they are full (mWh)"""
+        return sum(battery.energy_full for battery in self._require_batteries())
+
+    @property
+    def power(self) -> int:
+        """Power of all batteries (mW)"""
+        return sum(battery.power for battery in self._require_batteries())
+
+    @property
+    def capacity(self) -> float:
+        """Percentage of all batteries, weighted by their energy. Mean of capacities if it's not available"""
+        batteries = self._require_batteries()
+        try:
+            return round(self.energy / self.energy_full * 100, 2)
+        except (KeyError, ZeroDivisionError):
+            return round(sum(battery.capacity for battery in batteries) / len(batteries), 2)
+
+    @property
+    def remaining_time(self) -> float:
+        """Remaining seconds of all batteries while discharging, inf otherwise"""
+        discharging = [battery for battery in self._require_batteries() if battery.status == "Discharging"]
+        if not discharging:
+            return float("inf")
+        power_ = sum(battery.power for battery in discharging)
+        return round(self.energy / power_ * 3600) if power_ else float("inf")
+
+
+class PowerSupplyMonitor(Monitor):
+    """ In-memory state of the power supplies kept up to date by kernel uevents
+
+            :Params:
+                :critical (int): Capacity percent below which the 'critical' event is fired
+                :poll   (float): Seconds between reads of /sys/class/power_supply if uevents are
+                                 not available (e.g. some containers)
+                :refresh (float): Seconds between reads of /sys/class/power_supply when uevents are
+                                  received. Some batteries don't send an uevent on every capacity change
+
+
+    It listens to the NETLINK_KOBJECT_UEVENT socket: power_supply uevents carry every property, so
+    the state is updated without reading sysfs. Callbacks can be registered with on() for 'add',
+    'remove', 'plug' and 'unplug' (adapters), 'status' (battery charging state transitions) and
+    'critical' (a battery capacity drops below critical or its capacity_level becomes 'Critical').
+    They receive the new Battery, Ups or Adapter record.
+
+    Pending events are processed by every call to supplies(), or by a background thread after
+    start(). See _monitor.Monitor for the callbacks and thread semantics.
+    """
+    _EVENTS = ("add", "remove", "plug", "unplug", "status", "critical")
+    _THREAD_NAME = "statux-power-supplies"
+
+    def __init__(self, critical=5, poll=2.0, refresh=60.0):
+        super().__init__()
+        self.critical = critical
+        self.poll = poll
+        self.refresh = refresh
+        try:
+            self._socket = UeventSocket()  # Subscribed before reading sysfs to not miss any change
+        except OSError:
+            self._socket = None
+        self._supplies = {}
+        self._snapshot = PowerSupplies(self._supplies)
+        self._sync()
+
+    @property
+    def _timeout(self) -> float:
+        return self.refresh if self._socket is not None else self.poll
+
+    def _wait_time(self) -> float:
+        return max(self._timeout - (monotonic() - self._synced), 0.0)
+
+    def _sync(self):
+        # Reads every supply from sysfs. Used at start, periodically and when uevents were lost
+        self._synced = monotonic()
+        supplies = PowerSupplies().supplies
+        with self._lock:
+            for name in set(self._supplies) - set(supplies):
+                self._remove(name)
+            for supply in supplies.values():
+                self._update(supply)
+            self._snapshot = PowerSupplies(self._supplies)
+        self._dispatch()
+
+    def _update(self, supply: PowerSupply):
+        old = self._supplies.get(supply.name)
+        self._supplies[supply.name] = supply
+        if old is None:
+            self._notify("add", supply)
+            return
+        if type(supply) is Adapter and old.fields.get("online") != supply.fields.get("online"):
+            self._notify("plug" if supply.fields.get("online") else "unplug", supply)
+        if isinstance(supply, Battery):
+            if old.fields.get("status") != supply.fields.get("status"):
+                self._notify("status", supply)
+            if self._is_critical(supply) and not self._is_critical(old):
+                self._notify("critical", supply)
+
+    def _is_critical(self, battery: Battery) -> bool:
+        capacity_ = battery.fields.get("capacity")
+        return (battery.fields.get("capacity_level") == "Critical" or
+                (isinstance(capacity_, int) and capacity_ < self.critical))
+
+    def _remove(self, name: str):
+        supply = self._supplies.pop(name, None)
+        discard(join(_PARENT, name, _UEVENT))
+        if supply is not None:
+            self._notify("remove", supply)
+
+    def _handle(self, event: dict):
+        # Updates the state with a power_supply uevent
+        name = basename(event.get("DEVPATH", ""))
+        if event.get("ACTION") == "remove":
+            self._remove(name)
+            return
+        fields = _parse_fields(event.items())
+        old = self._supplies.get(name)
+        if "type" not in fields and old is not None:
+            fields["type"] = old.fields.get("type")
+        if "type" not in fields:
+            try:
+                fields = _parse_uevent(read(join(_PARENT, name, _UEVENT)))
+            except FileNotFoundError:
+                return
+        self._update(_make_supply(name, fields))
+
+    def _receive(self):
+        # Processes the pending uevents, and reads sysfs if they were lost or it's time to refresh
+        resync = False
+        if self._socket is not None:
+            with self._lock:
+                for event in self._socket.events():
+                    if event.get("SUBSYSTEM") == "power_supply":
+                        self._handle(event)
+                self._snapshot = PowerSupplies(self._supplies)
+                if self._socket.overflowed:  # Socket buffer overflowed. Some uevents have been lost
+                    self._socket.overflowed, resync = False, True
+            self._dispatch()
+        if resync or monotonic() - self._synced >= self._timeout:
+            self._sync()
+
+    def supplies(self) -> PowerSupplies:
+        """Returns the current PowerSupplies snapshot"""
+        self.update()
+        return self._snapshot
+
+
+def start_monitor(critical=5) -> PowerSupplyMonitor:
+    """Starts a shared PowerSupplyMonitor. Battery and AC adapter functions will use its state"""
+    global _monitor
+    if _monitor is None:
+        _monitor = PowerSupplyMonitor(critical).start()
+    return _monitor
+
+
+def stop_monitor():
+    """Stops the shared PowerSupplyMonitor"""
+    global _monitor
+    if _monitor is not None:
+        _monitor.close()
+        _monitor = None
 
 
-def _get_values(supply="BAT"):
-    return {key: value for key, value in _get_uevent(supply)}
+@ex_handler
+def power_supplies() -> PowerSupplies:
+    """Returns a PowerSupplies snapshot with every battery, adapter and UPS"""
+    return _monitor.supplies() if _monitor is not None else PowerSupplies()
 
 
-def _get_value(item: str, supply="BAT"):
-    for key, value in _get_uevent(supply):
-        if key == item:
-            return value
-    raise KeyError
+def _battery() -> Battery:
+    return power_supplies().battery
 
 
 def _get_upower():
@@ -96,8 +458,6 @@ def _get_upower():
         ud = "%" if percent_ else "s"
         m = line.replace(pattern, "").split("=")
         res[m[0]] = "%s%s" % (m[1][:-1], ud)
-    global _PTH
-    _PTH = _UPOWER
     with open(_UPOWER, "r") as f:
         file = f.readlines()
         res = {}
@@ -128,109 +488,82 @@ def _get_upower():
 @ex_handler
 def battery_info() -> dict:
     """Returns a dict with manufacturer, model and serial number of the battery"""
-    stat = _get_values()
-    return {
-        "Manufacturer":  stat["manufacturer"],
-        "Model":         str(stat["model_name"]),
-        "Serial Number": str(stat["serial_number"])
-    }
+    return _battery().info
 
 
 @ex_handler
 def status() -> str:
     """Returns the status battery ('Full', 'Charging' or 'Discharging')"""
-    return _get_value("status")
+    return _battery().status
 
 
 @ex_handler
 def is_present() -> bool:
     """Return True if the battery is present, False otherwise"""
-    return bool(int(_get_value("present")))
+    return _battery().present
 
 
 @ex_handler
 def voltage() -> int:
     """Return the battery voltage (mV)"""
-    return round(_get_value("voltage_now") / 10**3)
+    return _battery().voltage
 
 
 @ex_handler
 def current() -> int:
     """Return the battery current (mA)"""
-    current_ = _get_value("current_now")
-    if current_ is None:  # current value is not given...
-        stat = _get_values()
-        power_, voltage_ = stat["power_now"], stat["voltage_now"]  # so, let's try to get power and voltage
-        return round(power_ / voltage_ * 10**3)
-    return round(current_ / 10**3)
+    return _battery().current
 
 
 @ex_handler
 def energy() -> int:
     """Returns the battery energy value (mWh)"""
-    try:
-        energy_ = _get_value("energy_now")
-        return round(energy_ / 10**3)
-    except KeyError:  # energy value is not given...
-        stat = _get_values()
-        voltage_, charge_ = stat["voltage_now"], stat["charge_now"]  # so let's try to get voltage and charge
-        return round(voltage_ * charge_ / 10 ** 9)
+    return _battery().energy
 
 
 @ex_handler
 def power() -> int:
     """Return the battery power (mW)"""
-    stat = _get_values()
-    try:
-        voltage_, current_ = stat["voltage_now"], stat["current_now"]
-    except KeyError:
-        return round(stat["power_now"] / 10 ** 3)
-    return round(voltage_ * current_ / 10 ** 9)
+    return _battery().power
 
 
 @ex_handler
 def charge() -> int:
     """Returns the current battery charge (mAh)"""
-    try:
-        charge_ = _get_value("charge_now")
-        return round(charge_ / 10**3)
-    except KeyError:  # charge value is not given...
-        stat = _get_values()
-        energy_, voltage_ = stat["energy_now"], stat["voltage_now"]
-        return round(energy_ / voltage_ * 10**3)
+    return _battery().charge
 
 
 @ex_handler
 def capacity() -> int:
     """Return the current percentage of the battery (%)"""
-    return _get_value("capacity")
+    return _battery().capacity
 
 
 @ex_handler
 def capacity_level() -> str:
     """Return the current battery capacity level ('Full', 'Normal', 'Low' or 'Critical')"""
-    return _get_value("capacity_level")
+    return _battery().capacity_level
 
 
-@ex_handler
+@_upower_ex_handler
 def low_level() -> str:
     """Returns the value set for low battery level (% or seconds)"""
     return _get_upower()["Low"]
 
 
-@ex_handler
+@_upower_ex_handler
 def critical_level() -> str:
     """Returns the value set for critical battery (% or seconds)"""
     return _get_upower()["Critical"]
 
 
-@ex_handler
+@_upower_ex_handler
 def action_level() -> str:
     """Returns the value of the critical power action level (% or seconds)"""
     return _get_upower()["Action"]
 
 
-@ex_handler
+@_upower_ex_handler
 def critical_power_action() -> str:
     """Returns critical power action ('PowerOff', 'Hibernate' or 'HybridSleep')"""
     return _get_upower()["PowerAction"]
@@ -244,15 +577,10 @@ def remaining_time(format_time=False):
         :format (bool): If format is False returns remaining seconds, a time format string (H:M) otherwise
 
     """
-    stat = _get_values()
-    try:
-        dividend, divider, voltage_ = stat["charge_now"], stat["current_now"], stat["voltage_now"]
-    except KeyError:
-        dividend, divider, voltage_ = stat["energy_now"], stat["power_now"], stat["voltage_now"]
-    na = stat["status"] != "Discharging" or (voltage_ > 0 and divider == 0)
-    value = not na and dividend / divider
-    return (float("inf") if na else "%d:%02d" % (int(value), round((value - int(value)) * 60)) if format_time
-            else round(value * 3600))
+    seconds = _battery().remaining_time
+    if seconds == float("inf") or not format_time:
+        return seconds
+    return "%d:%02d" % divmod(round(seconds / 60), 60)
 
 
 @ex_handler
@@ -262,27 +590,19 @@ def wear_level() -> float:
     It's a health indicator of the battery (less is better)
 
     """
-    stat = _get_values()
-    try:  # Let's try to get charge values
-        full, design = stat["charge_full"], stat["charge_full_design"]
-    except KeyError:  # Charge values are not given, so let's try do it with energy values.
-        full, design = stat["energy_full"], stat["energy_full_design"]
-    return round(100 - (full / design * 100), 2)
+    return _battery().wear_level
 
 
 @ex_handler
 def technology() -> str:
     """Returns chemistry of the battery"""
-    return _get_value("technology")
+    return _battery().technology
 
 
 @ex_handler
 def supply_type() -> str:
     """Returns type of supply ('Battery', 'Mains', 'UPS', etc)"""
-    try:
-        return _get_stat("type", supply="BAT")[0][:-1]
-    except IndexError:
-        raise ValueNotFoundError("supply type", _PTH, 61)
+    return _battery().type
 
 
 ##############
@@ -314,4 +634,4 @@ def lid_state() -> str:
 @ex_handler
 def ac_adapter_online() -> bool:
     """Returns True if AC adapter is online, False otherwise"""
-    return bool(int(_get_value("online", supply="ACAD")))
+    return power_supplies().ac_online
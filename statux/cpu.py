@@ -13,35 +13,206 @@
 #
 # (ɔ) Iván Rincón 2019
 
+from array import array
+from collections import namedtuple
 from os import listdir
 from os.path import join
-from statux._conversions import set_mhz
+from statux._conversions import set_celsius, set_mhz
+from statux._reader import read, read_leading, read_once, discard_missing
+from statux._sampler import Sampler
 from statux._errors import *
-from time import sleep
+from statux.temp import sensor_index
 from typing import Union, List
 
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
 
 _PROC_PTH = "/proc/"
 _STAT = "%sstat" % _PROC_PTH
 _CPUINFO = "%scpuinfo" % _PROC_PTH
 _UPTIME = "%suptime" % _PROC_PTH
-_FREQUENCY_POLICY = "/sys/devices/system/cpu/cpufreq/"
+_SYS_CPU = "/sys/devices/system/cpu/"
+_ONLINE = "%sonline" % _SYS_CPU
+_TOPOLOGY = "%scpu%d/topology/"
+_SYS_NODE = "/sys/devices/system/node/"
+_FREQUENCY_POLICY = "%scpufreq/" % _SYS_CPU
 
 # Cache:
-_MAX_FREQUENCY = None  # MHz
+_topology = None
+_frequency_sampler = None
+
+
+def _parse_cpu_list(cpu_list: str) -> list:
+    # Returns a list of cpus from a cpu list string. E.g.: "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11]
+    res = []
+    for item in cpu_list.strip().split(","):
+        if item:
+            first, _, last = item.partition("-")
+            res.extend(range(int(first), int(last or first) + 1))
+    return res
+
+
+CpuInfo = namedtuple("CpuInfo", "cpu core die package node")
+
+
+class CpuTopology:
+    """ Snapshot of the CPU topology
+
+    It maps each online logical cpu to its core, die, package (physical id) and NUMA node from
+    /sys/devices/system/cpu/cpu*/topology and /sys/devices/system/node/node*/cpulist. CPU flags and
+    model names are read once from /proc/cpuinfo.
+
+    Use topology() to get a snapshot, it's rebuilt only when a CPU hotplug is detected.
+    """
+    def __init__(self):
+        self.online_list = read(_ONLINE)
+        online = _parse_cpu_list(self.online_list.decode())
+        cpuinfo = self._get_cpuinfo()
+        nodes = self._get_nodes()
+        cpus = {}
+        for cpu in online:
+            pth = _TOPOLOGY % (_SYS_CPU, cpu)
+            fallback = cpuinfo.get(cpu, {})
+            try:
+                core = int(read_once("%score_id" % pth))
+                package = int(read_once("%sphysical_package_id" % pth))
+            except FileNotFoundError:  # No topology in sysfs (e.g. some VMs and old kernels)
+                core, package = fallback.get("core id", cpu), fallback.get("physical id", 0)
+            try:
+                die = int(read_once("%sdie_id" % pth))
+            except (FileNotFoundError, ValueError):  # die_id was added in Linux 5.2
+                die = 0
+            cpus[cpu] = CpuInfo(cpu, core, die, package, nodes.get(cpu, 0))
+        self.cpus = cpus
+        self.cores = frozenset((info.package, info.die, info.core) for info in cpus.values())
+        self.packages = frozenset(info.package for info in cpus.values())
+
+    def _get_cpuinfo(self) -> dict:
+        # -> dict: keys = logical cpus, values = dict(physical id, core id)
+        res = {}
+        flags = set()
+        models = []
+        processor = None
+        with open(_CPUINFO, "rb") as file:
+            for line in file:
+                key, _, value = line.partition(b":")
+                key = key.strip()
+                if key == b"processor":
+                    processor = int(value)
+                    res[processor] = {}
+                elif key == b"flags":
+                    flags.update(value.decode().split())
+                elif key == b"model name":
+                    model = value.strip().decode()
+                    model not in models and models.append(model)
+                elif key in (b"physical id", b"core id") and processor is not None:
+                    res[processor][key.decode()] = int(value)
+        self.flags = frozenset(flags)
+        self.models = tuple(models)
+        return res
+
+    @staticmethod
+    def _get_nodes() -> dict:
+        # -> dict: keys = logical cpus, values = NUMA node
+        res = {}
+        try:
+            nodes = [node for node in listdir(_SYS_NODE) if node.startswith("node")]
+        except FileNotFoundError:  # Kernel without NUMA support
+            return res
+        for node in nodes:
+            for cpu in _parse_cpu_list(read_once("%s%s/cpulist" % (_SYS_NODE, node)).decode()):
+                res[cpu] = int(node[4:])
+        return res
+
+    def is_current(self) -> bool:
+        """Returns False if cpus have been set online or offline after building the snapshot"""
+        return read(_ONLINE) == self.online_list
+
+    def node_cpus(self) -> dict:
+        """Returns a dict with NUMA nodes as keys and lists of logical cpus as values"""
+        res = {}
+        for info in self.cpus.values():
+            res.setdefault(info.node, []).append(info.cpu)
+        return res
+
+
+@ex_handler(_SYS_CPU, "cpu topology")
+def topology() -> CpuTopology:
+    """Returns the cached CpuTopology. It's rebuilt if a CPU hotplug is detected"""
+    global _topology
+    if _topology is None or not _topology.is_current():
+        _topology = CpuTopology()
+    return _topology
 
 
 def _has_flag(flag: str) -> bool:
-    def flags():
-        with open(_CPUINFO, "r") as f:
-            for line in f:
-                if line.startswith("flags"):
-                    return line.split()[2:]
-    return flag in flags()
+    return flag in topology().flags
+
+
+def _get_cpu_block() -> tuple:
+    # Parses the cpu lines of /proc/stat into a flat array of ints.
+    # Returns (rows, columns, array). Row 0 is the aggregate "cpu" line, the rest are logical cpus
+    stat = read_leading(_STAT, b"cpu")  # cpu lines are always at the beginning of the file
+    tokens = stat.split()
+    rows = stat.count(b"\n") or 1
+    columns = len(tokens) // rows - 1
+    del tokens[::columns + 1]  # Removing cpu names
+    return rows, columns, array("Q", map(int, tokens))
+
+
+def _active_ratios(old_stat: array, new_stat: array, columns: int, first: int, last: int) -> list:
+    # Returns active/total ratios of rows [first, last) in one pass. Idle and iowait (columns 3 and 4)
+    # are considered inactive time
+    if _np is not None:
+        old = _np.frombuffer(old_stat, dtype=_np.uint64).reshape(-1, columns)[first:last].astype(_np.int64)
+        new = _np.frombuffer(new_stat, dtype=_np.uint64).reshape(-1, columns)[first:last].astype(_np.int64)
+        delta = new - old
+        total = delta.sum(axis=1)
+        active = total - delta[:, 3] - delta[:, 4]
+        return [a / t if t != 0 else None for a, t in zip(active.tolist(), total.tolist())]
+    res = []
+    for row in range(first * columns, last * columns, columns):
+        total = sum(new_stat[row:row + columns]) - sum(old_stat[row:row + columns])
+        idle = new_stat[row + 3] + new_stat[row + 4] - old_stat[row + 3] - old_stat[row + 4]
+        res.append((total - idle) / total if total != 0 else None)
+    return res
+
+
+class _CpuSampler(Sampler):
+    # Base of the samplers of /proc/stat cpu lines. Stats are the blocks of _get_cpu_block()
+    _source = _STAT
+    _read_all = staticmethod(_get_cpu_block)
+
+    def __init__(self, initialize=False):
+        self._columns = None
+        super().__init__(initialize)
+
+    def _get_stat(self) -> tuple:
+        return _get_cpu_block()
+
+    def _arrays(self, old_block: tuple, new_block: tuple, elapsed: float) -> tuple:
+        # Returns old and new stat arrays of a pair of blocks
+        (_, _, old_stat), (_, self._columns, new_stat) = old_block, new_block
+        if len(old_stat) != len(new_stat):  # CPU hotplug. There isn't a previous value
+            old_stat = new_stat
+        return old_stat, new_stat
+
+    def _get_arrays(self, interval: float) -> tuple:
+        return self._arrays(*self._get_pair(interval))
+
+    async def _aget_arrays(self, interval: float) -> tuple:
+        return self._arrays(*await self._aget_pair(interval))
+
+    def __len__(self):
+        _, columns, stat = self._get_stat()
+        return len(stat) // columns - 1
 
 
 @ex_handler(_STAT, "CPU load")
-class Load:
+class Load(_CpuSampler):
     """ Class to get CPU Load Percentage.
 
             :Params:
@@ -53,18 +224,10 @@ class Load:
 
     It allows obtaining several percentage CPU load values in the same time interval instantiating
     the class.
-    """
-    def __init__(self, initialize=False):
-        self._last = None
-        initialize and self.next_value()
-
-    @staticmethod
-    def _get_stat() -> list:
-        with open(_STAT, "rb") as file:
-            stat = file.readlines()
-            return [list(map(int, stat[line].split()[1:])) for line in range(len(stat))
-                    if stat[line].startswith(b"cpu")]
 
+    The cpu lines of /proc/stat are stored in a contiguous array and every core is computed in the
+    same pass (using NumPy if it's installed).
+    """
     def next_value(self, interval=0.0, per_core=False, precision=2) -> Union[float, List[float]]:
         """ Returns CPU load percentage
 
@@ -77,61 +240,193 @@ class Load:
             :precision  (int): Number of rounding decimals
 
         """
-        if self._last is None or interval > 0.0:
-            old_stat = self._get_stat()
-            sleep(interval)
-        else:
-            old_stat = self._last
-        new_stat = self._get_stat()
-        self._last = new_stat
-        if per_core:
-            old_stat = old_stat[1:]
-            new_stat = new_stat[1:]
-        else:
-            old_stat = old_stat[0:1]
-            new_stat = new_stat[0:1]
-
-        res = []
-        for cpu in range(len(old_stat)):
-            old_active = old_stat[cpu][:]
-            old_active[3:5] = []
-            new_active = new_stat[cpu][:]
-            new_active[3:5] = []
+        old_stat, new_stat = self._get_arrays(interval)
+        return self._load(old_stat, new_stat, per_core, precision)
 
-            old_total = sum(old_stat[cpu])
-            new_total = sum(new_stat[cpu])
+    async def anext_value(self, interval=0.0, per_core=False, precision=2) -> Union[float, List[float]]:
+        """ Coroutine version of next_value(). It waits with asyncio.sleep()
 
-            total_dif = new_total - old_total
-            active_dif = sum(new_active) - sum(old_active)
-
-            res.append(round(active_dif / total_dif * 100, precision) if total_dif != 0 else 0.0)
+        Concurrent awaiters (of any Load instance) asking for the same interval share the reads
+        of /proc/stat
+        """
+        old_stat, new_stat = await self._aget_arrays(interval)
+        return self._load(old_stat, new_stat, per_core, precision)
+
+    def _load(self, old_stat: array, new_stat: array, per_core: bool, precision: int):
+        rows = len(new_stat) // self._columns
+        first, last = (1, rows) if per_core else (0, 1)
+        res = [round(ratio * 100, precision) if ratio is not None else 0.0
+               for ratio in _active_ratios(old_stat, new_stat, self._columns, first, last)]
         len_ = len(res)
         if len_ < 1:
             raise ValueNotFoundError("CPU Load", _STAT, errno.ENODATA)
         return res if len_ > 1 else res[0]
 
-    def __len__(self):
-        return len(self._get_stat()) - 1
+
+CpuTimes = namedtuple("CpuTimes", "user nice system idle iowait irq softirq steal guest guest_nice")
+
+
+def _times_ratios(old_stat: array, new_stat: array, columns: int, first: int, last: int) -> list:
+    # Returns the ratio of every time column of rows [first, last). Guest times are already accounted
+    # in user and nice, so the total is the sum of the first 8 columns (user ... steal)
+    busy = min(columns, 8)
+    if _np is not None:
+        old = _np.frombuffer(old_stat, dtype=_np.uint64).reshape(-1, columns)[first:last].astype(_np.int64)
+        new = _np.frombuffer(new_stat, dtype=_np.uint64).reshape(-1, columns)[first:last].astype(_np.int64)
+        delta = new - old
+        total = delta[:, :busy].sum(axis=1)
+        return [(row, t) for row, t in zip(delta.tolist(), total.tolist())]
+    res = []
+    for row in range(first * columns, last * columns, columns):
+        delta = [n - o for n, o in zip(new_stat[row:row + columns], old_stat[row:row + columns])]
+        res.append((delta, sum(delta[:busy])))
+    return res
+
+
+@ex_handler(_STAT, "CPU times")
+class Times(_CpuSampler):
+    """ Class to get the percentage of CPU time spent in each state.
+
+            :Params:
+                :initialize (bool): When initialize is True, next_value() is called to set self._last.
+
+
+    Like Load, but instead of an active percentage it returns a CpuTimes namedtuple (user, nice,
+    system, idle, iowait, irq, softirq, steal, guest and guest_nice percentages) computed from the
+    same read of /proc/stat. Columns not provided by the kernel are 0.0
+    """
+    def next_value(self, interval=0.0, per_core=False, precision=2) -> Union[CpuTimes, List[CpuTimes]]:
+        """ Returns CPU times percentages
+
+        :Params:
+            :interval (float): Seconds. When value is greater than zero, it returns cpu times percentages
+                              in that period of time. When interval value is 0, it returns cpu times
+                              percentages since the last call
+            :per_core  (bool): When per_core is True it returns a list with a CpuTimes per logical cpu,
+                              if it's set to False returns the CpuTimes of all cpus.
+            :precision  (int): Number of rounding decimals
+
+        """
+        old_stat, new_stat = self._get_arrays(interval)
+        return self._times(old_stat, new_stat, per_core, precision)
+
+    async def anext_value(self, interval=0.0, per_core=False, precision=2) -> Union[CpuTimes, List[CpuTimes]]:
+        """Coroutine version of next_value(). It waits with asyncio.sleep()"""
+        old_stat, new_stat = await self._aget_arrays(interval)
+        return self._times(old_stat, new_stat, per_core, precision)
+
+    def _times(self, old_stat: array, new_stat: array, per_core: bool, precision: int):
+        rows = len(new_stat) // self._columns
+        first, last = (1, rows) if per_core else (0, 1)
+        missing = (0.0,) * (len(CpuTimes._fields) - self._columns)
+        res = [CpuTimes._make([round(d / total * 100, precision) if total != 0 else 0.0
+                               for d in delta[:len(CpuTimes._fields)]] + list(missing))
+               for delta, total in _times_ratios(old_stat, new_stat, self._columns, first, last)]
+        len_ = len(res)
+        if len_ < 1:
+            raise ValueNotFoundError("CPU Times", _STAT, errno.ENODATA)
+        return res if per_core else res[0]
 
 
 def logical_cpus() -> int:
-    return len(Load())
+    """Return the number of online logical processors"""
+    return len(topology().cpus)
 
 
-@ex_handler(_CPUINFO)
 def physical_cpus() -> int:
     """Return the number of physical processors"""
-    # TODO: to get better
+    res = len(topology().cores)
+    if not res:
+        raise ValueNotFoundError("physical cpu's", _SYS_CPU, errno.ENODATA)
+    return res
+
+
+CpuFrequency = namedtuple("CpuFrequency", "current min max percent")
+
+
+class FrequencySampler:
+    """ Class to get current, min and max frequency of each logical cpu from cpufreq
+
+    Policies are mapped to cpus through related_cpus once, so every sample is a batch of reads of
+    cpufreq/policy*/scaling_cur_freq (their descriptors are kept open). Unlike /proc/cpuinfo, it
+    doesn't force the kernel to query every core. Policies without online cpus are skipped, and
+    the cached sampler is rebuilt when a cpu is set online or offline.
+    """
+    def __init__(self):
+        topology_ = topology()
+        online = topology_.cpus
+        policies = sorted((policy for policy in listdir(_FREQUENCY_POLICY) if policy.startswith("policy")),
+                          key=lambda policy: int(policy[6:]))
+        self._paths = []
+        self._limits = []  # (min, max) kHz per policy
+        self._online_list = topology_.online_list
+        cpus = []
+        active = []
+        for policy in policies:
+            pth = join(_FREQUENCY_POLICY, policy)
+            related = [cpu for cpu in _parse_cpu_list(read_once(join(pth, "related_cpus")).decode()) if cpu in online]
+            if not related:  # Inactive policy: its frequencies can't be read (EBUSY) while its cpus are offline
+                continue
+            active.append(policy)
+            cpus.extend((cpu, len(self._paths)) for cpu in related)
+            self._paths.append(join(pth, "scaling_cur_freq"))
+            self._limits.append((int(read_once(join(pth, "cpuinfo_min_freq"))),
+                                 int(read_once(join(pth, "cpuinfo_max_freq")))))
+        discard_missing(_FREQUENCY_POLICY, active)  # Descriptors of policies set offline
+        cpus.sort()
+        self.cpus = [cpu for cpu, _ in cpus]
+        self._policy_index = [index for _, index in cpus]  # policy position of each cpu
+        if not self.cpus:
+            raise ValueNotFoundError("cpu frequency", _FREQUENCY_POLICY, errno.ENODATA)
+
+    def is_current(self) -> bool:
+        """Returns False if cpus have been set online or offline after building the sampler"""
+        return topology().online_list == self._online_list
+
+    def sample(self, scale="mhz", precision=3, percent_precision=2) -> List[CpuFrequency]:
+        """ Returns a list with a CpuFrequency (current, min, max and percent) per logical cpu
+
+        :Params:
+            :scale             (str): Return scale (Hz, KHz, MHz or GHz). MHz by default. Case insensitive
+            :precision         (int): Number of rounding decimals of frequencies
+            :percent_precision (int): Number of rounding decimals of percent
+
+        """
+        current = [int(read(pth)) for pth in self._paths]  # kHz
+        res = []
+        for index in self._policy_index:
+            cur, (min_, max_) = current[index], self._limits[index]
+            res.append(CpuFrequency(round(set_mhz(cur / 1000, scale), precision),
+                                    round(set_mhz(min_ / 1000, scale), precision),
+                                    round(set_mhz(max_ / 1000, scale), precision),
+                                    round(cur / max_ * 100, percent_precision) if max_ else 0.0))
+        return res
+
+
+@ex_handler(_FREQUENCY_POLICY, "cpu frequency")
+def _get_frequency_sampler() -> FrequencySampler:
+    global _frequency_sampler
+    if _frequency_sampler is None or not _frequency_sampler.is_current():
+        _frequency_sampler = FrequencySampler()
+    return _frequency_sampler
+
+
+def _mean(values: list, precision: int) -> float:
+    return round(sum(values) / float(len(values)), precision)
+
+
+def _cpuinfo_frequencies(scale: str, precision: int) -> dict:
+    # -> dict: keys = processor ids, values = cpu MHz of /proc/cpuinfo. Used when there's no cpufreq
+    res, cpu = {}, None
     with open(_CPUINFO, "rb") as file:
-        res = {}
-        stat = file.readlines()
-        for i in range(len(stat)):
-            if stat[i].startswith(b"physical id"):
-                physical_id = int(stat[i].split()[-1])
-                res[physical_id] = int(stat[i+3].split()[-1])
-        if not len(res):
-            raise ValueNotFoundError("physical cpu's", _CPUINFO, errno.ENODATA)
-        return sum(res.values())
+        for line in file:
+            if line.startswith(b"processor"):
+                cpu = int(line.split()[-1])
+            elif line.startswith(b"cpu MHz") and cpu is not None:
+                res[cpu] = round(set_mhz(float(line.split()[-1]), scale), precision)
+    if not res:
+        raise ValueNotFoundError("cpu frequency", _CPUINFO, errno.ENODATA)
+    return res
 
 
 def frequency(per_core=True, scale="mhz", precision=3) -> Union[float, List[float]]:
@@ -145,13 +440,11 @@ def frequency(per_core=True, scale="mhz", precision=3) -> Union[float, List[floa
         :precision (int): Number of rounding decimals
 
     """
-
-    with open(_CPUINFO, "rb") as file:
-        stat = file.readlines()
-        r = [round(set_mhz(float(line.split()[-1]), scale), precision) for line in stat if line.startswith(b"cpu MHz")]
-        if not len(r):
-            raise(ValueNotFoundError("cpu frequency", _CPUINFO, errno.ENODATA))
-        return r if per_core else round(sum(r) / float(len(r)), precision)
+    try:
+        r = [freq.current for freq in _get_frequency_sampler().sample(scale, precision)]
+    except ValueNotFoundError:  # No cpufreq (e.g. virtual machines)
+        r = [freq for cpu, freq in sorted(_cpuinfo_frequencies(scale, precision).items())]
+    return r if per_core else _mean(r, precision)
 
 
 def max_frequency(per_core=True, scale="mhz", precision=3) -> Union[float, List[float]]:
@@ -165,28 +458,8 @@ def max_frequency(per_core=True, scale="mhz", precision=3) -> Union[float, List[
             :precision (int): Number of rounding decimals
 
         """
-    global _MAX_FREQUENCY
-    r = []
-    err_no = 0
-    if _MAX_FREQUENCY is None:
-        try:
-            for policy in listdir(_FREQUENCY_POLICY):
-                if policy.startswith("policy"):
-                    for file in listdir(join(_FREQUENCY_POLICY, policy)):
-                        if file == "cpuinfo_max_freq":
-                            with open(join(_FREQUENCY_POLICY, policy, file), "rb") as stat:
-                                r.insert(int(policy[-1]), int(stat.readline()) / 1000)
-                            break
-        except ValueError:
-            err_no = errno.ENODATA
-        err_no = errno.ENOENT if not len(r) else err_no
-        if err_no:
-            raise ValueNotFoundError("cpu max frequency", _FREQUENCY_POLICY, err_no)
-        _MAX_FREQUENCY = r  # MHz
-    else:
-        r = _MAX_FREQUENCY
-    rs = list(map(lambda x: round(set_mhz(x, scale), precision), r))
-    return rs if per_core else round(sum(rs) / float(len(rs)), precision)
+    rs = [freq.max for freq in _get_frequency_sampler().sample(scale, precision)]
+    return rs if per_core else _mean(rs, precision)
 
 
 def frequency_percent(per_core=True, precision=2) -> Union[float, List[float]]:
@@ -199,10 +472,84 @@ def frequency_percent(per_core=True, precision=2) -> Union[float, List[float]]:
             :precision (int): Number of rounding decimals. 2 by default.
 
     """
-    global _MAX_FREQUENCY
-    mxm = max_frequency() if _MAX_FREQUENCY is None else _MAX_FREQUENCY
-    r = [round(c / m * 100, precision) for c, m in zip(frequency(), mxm)]
-    return r if per_core else round(sum(r) / float(len(r)), precision)
+    r = [freq.percent for freq in _get_frequency_sampler().sample(percent_precision=precision)]
+    return r if per_core else _mean(r, precision)
+
+
+CpuState = namedtuple("CpuState", "cpu core package load frequency temperature")
+
+
+class CpuStateSampler(_CpuSampler):
+    """ Class to get load, frequency and temperature of each logical cpu in a single sample
+
+            :Params:
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    Temperatures are joined through the topology: coretemp 'Core N' sensors are matched with the
+    core_id and physical_package_id of every logical cpu (so both hyperthreads of a core get the
+    same value). If a cpu has no core sensor, the package sensor is used. frequency or temperature
+    are None if they aren't available (e.g. virtual machines).
+    """
+    @staticmethod
+    def _frequencies(scale: str, precision: int) -> dict:
+        # -> dict: keys = cpu ids, values = current frequencies. Cpus without cpufreq policy are missing
+        try:
+            sampler = _get_frequency_sampler()
+            return {cpu: freq.current for cpu, freq in zip(sampler.cpus, sampler.sample(scale, precision))}
+        except (ValueNotFoundError, OSError):
+            pass
+        try:  # No cpufreq (e.g. virtual machines)
+            return _cpuinfo_frequencies(scale, precision)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _temperatures() -> tuple:
+        # -> tuple: (list of millidegrees or None, core_sensors) or (None, {}) if there are no sensors
+        try:
+            index = sensor_index()
+            return index.read(), index.core_sensors
+        except (ValueNotFoundError, OSError):
+            return None, {}
+
+    def _states(self, old_stat: array, new_stat: array, scale: str, temp_scale: str, precision: int) -> list:
+        rows = len(new_stat) // self._columns
+        ratios = _active_ratios(old_stat, new_stat, self._columns, 1, rows)
+        topology_ = topology()
+        cpus = sorted(topology_.cpus)  # /proc/stat rows are online cpus in ascending order
+        frequencies = self._frequencies(scale, precision)
+        stat, sensors = self._temperatures()
+        res = []
+        for i, cpu in enumerate(cpus):
+            info = topology_.cpus[cpu]
+            position = sensors.get((info.package, info.core), sensors.get((info.package, None)))
+            millidegrees = stat[position] if position is not None else None
+            ratio = ratios[i] if i < len(ratios) else None
+            res.append(CpuState(cpu, info.core, info.package,
+                                round(ratio * 100, precision) if ratio is not None else 0.0,
+                                frequencies.get(cpu),
+                                set_celsius(millidegrees, temp_scale, precision) if millidegrees is not None else None))
+        return res
+
+    def next_value(self, interval=0.0, scale="mhz", temp_scale="celsius", precision=2) -> List[CpuState]:
+        """ Returns a list with a CpuState (cpu, core, package, load, frequency, temperature) per logical cpu
+
+        :Params:
+            :interval  (float): Seconds. When value is greater than zero, it returns cpu load percentage
+                               in that period of time. When interval value is 0, it returns cpu load
+                               percentage since the last call
+            :scale       (str): Frequency scale (Hz, KHz, MHz or GHz). MHz by default
+            :temp_scale  (str): Temperature scale (Celsius, Fahrenheit, Kelvin or Rankine)
+            :precision   (int): Number of rounding decimals
+
+        """
+        return self._states(*self._get_arrays(interval), scale, temp_scale, precision)
+
+    async def anext_value(self, interval=0.0, scale="mhz", temp_scale="celsius", precision=2) -> List[CpuState]:
+        """Coroutine version of next_value(). It waits with asyncio.sleep()"""
+        return self._states(*await self._aget_arrays(interval), scale, temp_scale, precision)
 
 
 def is_x86_64() -> bool:
@@ -216,10 +563,5 @@ def model_name() -> Union[str, List[str]]:
     If there are more than one physical id with several models names, a list with its names
     will be returned.
     """
-    r = []
-    with open(_CPUINFO) as f:
-        for line in f:
-            if line.startswith("model name"):
-                r.append(line[line.find(": ")+2:-1])
-    result = list(set(r))  # Removing duplicated items
-    return r[0] if len(result) == 1 else result
+    models = topology().models
+    return models[0] if len(models) == 1 else list(models)
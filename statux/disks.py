@@ -14,27 +14,49 @@
 # (ɔ) Iván Rincón 2018, 2019
 
 import errno
+from time import monotonic
 from os import listdir, readlink, statvfs
-from os.path import basename, exists
+from select import poll, POLLERR, POLLPRI
+from threading import Lock, Thread
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from queue import SimpleQueue
+from os.path import basename, dirname, exists, realpath
+from statux._netlink import UeventSocket
+from statux._inotify import Inotify, IN_CHANGES, IN_ONLYDIR
 from statux._conversions import set_bytes
-from statux._errors import ValueNotFoundError, PartitionNotMountError, ex_handler
+from statux._errors import ValueNotFoundError, UnexpectedValueError, PartitionNotMountError, ex_handler
+from statux._reader import Reader, read_lines, read_once, on_close
+from statux._sampler import Sampler
 from collections import namedtuple
 
 _PROC = "/proc/"
 _DEV = "/dev/"
 _DISK = "%sdisk/" % _DEV
 _BLOCK_DEV = "/sys/block/"
+_CLASS_BLOCK = "/sys/class/block/"
 _QUEUE = "/queue/"
 _LB_SIZE = "%slogical_block_size" % _QUEUE
 _PB_SIZE = "%sphysical_block_size" % _QUEUE
-_MOUNTS = "%smounts" % _PROC
+_MOUNTINFO = "%sself/mountinfo" % _PROC
 _PARTITIONS = "%spartitions" % _PROC
 _DISKSTATS = "%sdiskstats" % _PROC
 
+_SECTOR_SIZE = 512  # diskstats sectors are always 512 bytes, whatever the block size of the device is
+
 # Cache:
-_last = None
-_mounts = None
-_bsize = None
+_samplers = {}  # partitions -> DiskIOSampler used by module methods
+_mounts = None  # (mount table version, {partition: mount point})
+_mount_table = None
+_block_index = None
+_persistent_names = None
+_statvfs_pool = None
+_pending = {}  # mount point -> Future of a statvfs call that has not finished yet
+_stale = {}    # mount point -> (monotonic time to retry, backoff seconds)
+_usage_lock = Lock()  # Guards the statvfs pool, _pending and _stale. usage_all() sweeps are serialized
+
+_BACKOFF_MIN = 5.0    # seconds
+_BACKOFF_MAX = 300.0  # seconds
+_RECHECK = 10.0       # seconds between checks of /sys/class/block if uevents are not received
 
 
 def block_devices() -> list:
@@ -61,20 +83,173 @@ def partitions(remove_disks=True) -> list:
     return res
 
 
+BlockDevice = namedtuple("BlockDevice", "name major minor disk partition logical_block_size physical_block_size "
+                                        "rotational removable model holders slaves")
+
+
+class BlockIndex:
+    """ Index of block devices (disks, partitions, dm, md, loop, etc) keyed by device number
+
+    It's built once from /sys/class/block/*/dev, partition, holders and slaves. Every node is mapped
+    to a BlockDevice namedtuple (name, major, minor, parent disk, partition, logical and physical
+    block sizes, rotational, removable, model, holders and slaves).
+
+    holders and slaves are the edges of the device DAG of stacked devices (LVM, dm-crypt, md RAID,
+    multipath, etc). E.g.: sda2 -> dm-0 (crypt) -> dm-1, dm-2 (LVM logical volumes).
+
+    The index is outdated when a block uevent is received (device added, removed or changed). If
+    uevents are not available (or not delivered, e.g. in some containers), /sys/class/block is
+    listed again every 10 seconds to detect changes.
+    """
+    def __init__(self):
+        try:
+            self._uevents = UeventSocket()  # Subscribed before listing to not miss any change
+        except OSError:
+            self._uevents = None
+        self._listing = frozenset(listdir(_CLASS_BLOCK))
+        self._checked = monotonic()
+        self.devices = {}  # (major, minor) -> BlockDevice
+        self.names = {}    # name -> (major, minor)
+        for name in self._listing:
+            try:
+                device = self._get_device(name)
+            except FileNotFoundError:  # Removed while building
+                continue
+            self.devices[device.major, device.minor] = device
+            self.names[name] = device.major, device.minor
+
+    @staticmethod
+    def _get_device(name: str) -> BlockDevice:
+        pth = "%s%s/" % (_CLASS_BLOCK, name)
+        major, _, minor = read_once(pth + "dev").decode().strip().partition(":")
+        partition = exists(pth + "partition")
+        # A partition is a subdirectory of its disk: /sys/devices/.../block/sda/sda1
+        disk = basename(dirname(realpath(pth))) if partition else name
+        disk_pth = "%s%s/" % (_CLASS_BLOCK, disk)
+
+        def flag(file):
+            try:
+                return bool(int(read_once(disk_pth + file)))
+            except (FileNotFoundError, ValueError):
+                return False
+
+        def size(file):
+            try:
+                return int(read_once(disk_pth + file))
+            except (FileNotFoundError, ValueError):
+                return 0
+
+        return BlockDevice(name, int(major), int(minor), disk, partition, size("queue/logical_block_size"),
+                           size("queue/physical_block_size"), flag("queue/rotational"), flag("removable"),
+                           _get_model(disk_pth + "device/"),
+                           tuple(listdir(pth + "holders")) if exists(pth + "holders") else (),
+                           tuple(listdir(pth + "slaves")) if exists(pth + "slaves") else ())
+
+    def is_current(self) -> bool:
+        """Returns False if block devices have changed since the index was built"""
+        if self._uevents is not None:
+            for event in self._uevents.events():
+                if event.get("SUBSYSTEM") == "block":
+                    return False
+            if self._uevents.overflowed:
+                return False
+        if monotonic() - self._checked > _RECHECK:
+            if frozenset(listdir(_CLASS_BLOCK)) != self._listing:
+                return False
+            self._checked = monotonic()
+        return True
+
+    def __getitem__(self, name: str) -> BlockDevice:
+        try:
+            return self.devices[self.names[name]]
+        except KeyError:
+            raise ValueNotFoundError(name, _CLASS_BLOCK, errno.ENODEV,
+                                     msg="%s not found in %s" % (name, _CLASS_BLOCK))
+
+    def by_number(self, major: int, minor: int) -> BlockDevice:
+        """Returns the BlockDevice of a device number (major, minor)"""
+        try:
+            return self.devices[major, minor]
+        except KeyError:
+            raise ValueNotFoundError("%d:%d" % (major, minor), _CLASS_BLOCK, errno.ENODEV)
+
+    def members(self, name: str) -> tuple:
+        """ Returns the devices at the bottom of a stacked device, following slaves (e.g.: the
+        partitions or disks of a RAID, or the partition under an LVM logical volume). A device
+        without slaves is its own member
+        """
+        device = self[name]
+        if not device.slaves:
+            return name,
+        res = []
+        for slave in device.slaves:
+            res.extend(member for member in self.members(slave) if member not in res)
+        return tuple(res)
+
+    def tops(self, name: str) -> tuple:
+        """ Returns the devices at the top of the stack over a disk or partition, following holders
+        (e.g.: the LVM logical volumes or RAID arrays stored in a disk). The partitions of a disk
+        are followed too. A device without holders (or partitions) is its own top
+        """
+        device = self[name]
+        lowers = device.holders or (() if device.partition else self.partitions(name))
+        if not lowers:
+            return name,
+        res = []
+        for lower in lowers:
+            res.extend(top for top in self.tops(lower) if top not in res)
+        return tuple(res)
+
+    def partitions(self, disk: str) -> tuple:
+        """Returns the partitions of a disk"""
+        return tuple(sorted(device.name for device in self.devices.values()
+                            if device.partition and device.disk == disk))
+
+    def mount_points(self, name: str) -> list:
+        """Returns a list with the mount points of a device"""
+        number = self.names.get(name)
+        return [entry.mount_point for entry in mount_table() if (entry.major, entry.minor) == number]
+
+    def close(self):
+        self._uevents is not None and self._uevents.close()
+
+
+def _get_model(pth: str):
+    # Returns "vendor model" of a device directory (/sys/block/sda/device/) or None (e.g. loop devices)
+    try:
+        model_ = read_once(pth + "model").decode().strip()
+    except FileNotFoundError:
+        return
+    try:
+        return "%s %s" % (read_once(pth + "vendor").decode().strip(), model_)
+    except FileNotFoundError:
+        return model_
+
+
+@ex_handler(_CLASS_BLOCK, "block devices")
+def block_index() -> BlockIndex:
+    """Returns the cached BlockIndex. It's rebuilt when block devices change"""
+    global _block_index
+    if _block_index is None or not _block_index.is_current():
+        _block_index is not None and _block_index.close()
+        _block_index = BlockIndex()
+    return _block_index
+
+
 def _check_partitions(*partitions_):
-    valid_partitions = partitions()
+    index = block_index()
     for ptt in partitions_:
-        if ptt not in valid_partitions:
+        if ptt not in index.names or not index[ptt].partition:
             raise ValueNotFoundError(ptt, _PARTITIONS, errno.ENODATA)
     return partitions_
 
 
-def _check_block(block):
-    valid_block_devices = block_devices()
-    if block not in valid_block_devices:
+def _check_block(block) -> BlockDevice:
+    index = block_index()
+    if block not in index.names or index[block].partition:
         raise ValueNotFoundError(block, "%s%s/" % (_BLOCK_DEV, block), errno.ENODEV,
                                  msg="%s not found in %s" % (block, _BLOCK_DEV))
-    return block
+    return index[block]
 
 
 def is_rotational(block_device: str) -> bool:
@@ -84,13 +259,7 @@ def is_rotational(block_device: str) -> bool:
             :block_device (str): Block device (HDD, SSD, pendrives, micro-sd, DVD, etc)
 
     """
-    fn = "%s%s%s%s" % (_BLOCK_DEV, _check_block(block_device), _QUEUE, "rotational")
-
-    @ex_handler(fn)
-    def fun():
-        with open(fn, "rb") as f:
-            return bool(int(f.read()))
-    return fun()
+    return _check_block(block_device).rotational
 
 
 def is_removable(block_device: str) -> bool:
@@ -98,13 +267,7 @@ def is_removable(block_device: str) -> bool:
         :Params:
             :block_device (str): Block device (HDD, SSD, pendrives, micro-sd, DVD, etc)
     """
-    fn = "%s%s/%s" % (_BLOCK_DEV, _check_block(block_device), "removable")
-
-    @ex_handler(fn)
-    def fun():
-        with open(fn, "rb") as f:
-            return bool(int(f.read()))
-    return fun()
+    return _check_block(block_device).removable
 
 
 def model(block_device: str) -> str:
@@ -112,26 +275,7 @@ def model(block_device: str) -> str:
         :Params:
             :block_device (str): Block device (HDD, SSD, pendrives, micro-sd, DVD, etc)
     """
-    pth = "%s%s/%s" % (_BLOCK_DEV, _check_block(block_device), "device")
-    mod = "%s/%s" % (pth, "model")
-
-    @ex_handler(mod)
-    def fun():
-        try:
-            with open(mod, "r") as mf:
-                vendor = "%s/%s" % (pth, "vendor")
-                lps = lambda x: x.readline().strip()
-                if exists(vendor):
-                    with open(vendor, "r") as vf:
-                        return "%s %s" % (lps(vf), lps(mf))
-                return lps(mf)
-        except FileNotFoundError:
-            if block_device in block_devices():
-                # e.g. loop devices
-                # TODO: Get better because it's redundant -> 1st line: _check_block(block_device)
-                return
-            raise
-    return fun()
+    return _check_block(block_device).model
 
 
 def _fix_escapes(string: str) -> str:
@@ -143,19 +287,98 @@ def _fix_escapes(string: str) -> str:
     return string if "\\" not in string else string.encode().decode("unicode-escape").encode("latin1").decode()
 
 
-def _get_disks_naming():
-    def fix_name(string):
-        return string.lstrip("by-")
-    fields = [d for d in listdir(_DISK)]
-    result = {ptt: {fix_name(d): "" for d in fields} for ptt in partitions(False)}
-    for d in fields:
-        pth = "%s%s/" % (_DISK, d)
-        for field in listdir(pth):
-            fn = "%s%s" % (pth, field)
-            field_name = fix_name(fn.split("/")[-2])
-            disk = basename(readlink(fn))
-            result[disk][field_name] = _fix_escapes(field)
-    return result
+class PersistentNames:
+    """ Index of the persistent names of disks and partitions (/dev/disk/by-id, by-uuid, by-label, etc)
+
+    It's built once reading the symlinks of /dev/disk/*/ and it's kept current with inotify: the
+    index is outdated when a symlink or a /dev/disk subdirectory is created, removed or renamed. If
+    inotify is not available, the index must be built again on every query.
+
+        :Attributes:
+            :fields (tuple): Persistent name types, e.g.: ('id', 'label', 'partuuid', 'path', 'uuid')
+            :names   (dict): Device -> {field: tuple with the names of the device}
+    """
+    def __init__(self):
+        try:
+            self._inotify = Inotify()
+        except OSError:
+            self._inotify = None
+        self._watch(_DISK, IN_CHANGES | IN_ONLYDIR)
+        self.names = {}
+        self._devices = {}  # (field, name) -> device
+        self._types = {}    # device -> namedtuple type returned by disk_naming
+        fields = []
+        for directory in listdir(_DISK):
+            pth = "%s%s/" % (_DISK, directory)
+            # Watched before listing to not miss any change
+            self._watch(pth, IN_CHANGES | IN_ONLYDIR)
+            field = directory[3:] if directory.startswith("by-") else directory
+            field = field.replace("-", "_")  # E.g.: 'by-loop-ref'
+            fields.append(field)
+            for link in listdir(pth):
+                try:
+                    device = basename(readlink(pth + link))
+                except OSError:  # Removed while building
+                    continue
+                name = _fix_escapes(link)
+                self.names.setdefault(device, {}).setdefault(field, []).append(name)
+                self._devices[field, name] = device
+        self.fields = tuple(sorted(fields))
+        for names in self.names.values():
+            for field in names:
+                names[field] = tuple(sorted(names[field]))
+
+    def _watch(self, path: str, mask: int):
+        if self._inotify is not None:
+            try:
+                self._inotify.add_watch(path, mask)
+            except OSError:
+                self.close()
+
+    def is_current(self) -> bool:
+        """Returns False if /dev/disk has changed since the index was built"""
+        if self._inotify is None:
+            return False
+        return next(self._inotify.events(), None) is None
+
+    def find(self, field: str, name: str) -> str:
+        """ Returns the device with the given persistent name
+
+            :Params:
+                :field (str): Persistent name type (e.g.: 'uuid', 'label', 'partuuid', 'id', 'path')
+                :name  (str): Persistent name (e.g.: '4c1ff6a5-3b72-4c8a-9a2d-1f1c2b0d8e61')
+
+        """
+        try:
+            return self._devices[field, name]
+        except KeyError:
+            pth = "%sby-%s/" % (_DISK, field)
+            raise ValueNotFoundError(name, pth, errno.ENODEV, msg="%s not found in %s" % (name, pth))
+
+    def close(self):
+        self._inotify is not None and self._inotify.close()
+        self._inotify = None
+
+
+@ex_handler(_DISK, "persistent names")
+def persistent_names() -> PersistentNames:
+    """Returns the cached PersistentNames index. It's rebuilt when /dev/disk changes"""
+    global _persistent_names
+    if _persistent_names is None or not _persistent_names.is_current():
+        _persistent_names is not None and _persistent_names.close()
+        _persistent_names = PersistentNames()
+    return _persistent_names
+
+
+def find_device(field: str, name: str) -> str:
+    """ Returns the disk or partition with the given persistent name (reverse lookup of disk_naming)
+
+        :Params:
+            :field (str): Persistent name type (e.g.: 'uuid', 'label', 'partuuid', 'id', 'path')
+            :name  (str): Persistent name (e.g.: find_device('label', 'Data Partition') -> 'sdb1')
+
+    """
+    return persistent_names().find(field, name)
 
 
 def disk_naming(disk_or_partition: str) -> namedtuple:
@@ -170,24 +393,116 @@ def disk_naming(disk_or_partition: str) -> namedtuple:
             :disk_or_partition (str): Disk or partition name (e.g.: 'sda', 'nvme0n1', 'sdb1', etc)
 
         """
-    try:
-        dic = _get_disks_naming()[disk_or_partition]
-    except KeyError:
+    index = persistent_names()
+    if disk_or_partition not in index.names and disk_or_partition not in block_index().names:
         raise ValueNotFoundError(disk_or_partition, _DISK, errno.ENODEV)
-    data = namedtuple(disk_or_partition, dic.keys())
-    return data(*dic.values())
+    names = index.names.get(disk_or_partition, {})
+    data = index._types.get(disk_or_partition)
+    if data is None:
+        data = index._types[disk_or_partition] = namedtuple(disk_or_partition, index.fields)
+    return data(*[names.get(field, ("",))[0] for field in index.fields])
 
 
-@ex_handler(_MOUNTS)
-def _get_mounts_info() -> dict:
-    # -> dict: keys = [mounted partitions], value = dict(mount_point, filesystem, mount_options)
-    with open(_MOUNTS, "r") as file:
-        res = {}
-        for line in file.readlines():
-            ls = line.split()
-            if ls[0].startswith("/dev"):
-                dev = ls[0][5:]
-                yield dev, _fix_escapes(ls[2]), ls[1], " ".join(ls[3:])  # mount_point, filesystem, mount_options
+class MountEntry(namedtuple("MountEntry", "mount_id parent_id major minor root mount_point mount_options "
+                                           "fstype source super_options bind")):
+    """ A line of /proc/self/mountinfo
+
+    bind is True if the entry is a bind mount, i.e. it mounts a subdirectory of a filesystem (root
+    is not '/') or a filesystem already mounted in a previous entry.
+    """
+    __slots__ = ()
+
+    @property
+    def options(self) -> str:
+        # Options as they are shown in /proc/mounts
+        super_options = [opt for opt in self.super_options.split(",") if opt not in ("rw", "ro")]
+        return ",".join([self.mount_options] + super_options) + " 0 0"
+
+
+class MountTable:
+    """ Cache of /proc/self/mountinfo
+
+    The file is kept open and parsed again only when the kernel signals a change in the mount
+    table (POLLPRI), so the steady state costs a poll() syscall and never returns stale mount points.
+    """
+    def __init__(self):
+        self._reader = Reader(_MOUNTINFO)
+        self._poll = poll()
+        self._poll.register(self._reader.fileno(), POLLPRI | POLLERR)
+        self._lock = Lock()
+        self._entries = None
+        self.version = 0
+
+    @staticmethod
+    def _parse(data: bytes) -> tuple:
+        res = []
+        devices = set()
+        for line in data.decode().splitlines():
+            # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+            fields, _, fs_fields = line.partition(" - ")
+            fields = fields.split()
+            fs_fields = fs_fields.split()
+            major, _, minor = fields[2].partition(":")
+            dev = major, minor
+            root = _fix_escapes(fields[3])
+            res.append(MountEntry(int(fields[0]), int(fields[1]), int(major), int(minor), root,
+                                  _fix_escapes(fields[4]), fields[5], fs_fields[0],
+                                  _fix_escapes(fs_fields[1]) if len(fs_fields) > 1 else "",
+                                  fs_fields[2] if len(fs_fields) > 2 else "",
+                                  root != "/" or dev in devices))
+            devices.add(dev)
+        return tuple(res)
+
+    def entries(self, reload=False) -> tuple:
+        """Returns a tuple of MountEntry namedtuples, parsing mountinfo only if it has changed"""
+        with self._lock:
+            if self._poll.poll(0) or self._entries is None or reload:
+                self._entries = self._parse(self._reader.read())
+                self.version += 1
+            return self._entries
+
+    def close(self):
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@ex_handler(_MOUNTINFO)
+def mount_table(reload=False) -> tuple:
+    """Returns a tuple with a MountEntry namedtuple per line of /proc/self/mountinfo
+
+        The fields are mount_id, parent_id, major, minor, root, mount_point, mount_options, fstype,
+        source, super_options and bind. The table is cached and parsed again only when something
+        is mounted or unmounted.
+
+        :Params:
+            :reload (bool): If it's True the table is parsed again anyway
+
+    """
+    global _mount_table
+    if _mount_table is None:
+        _mount_table = MountTable()
+    return _mount_table.entries(reload)
+
+
+@on_close
+def _close_caches():
+    # Closes the descriptors of the cached indexes (called by statux.close())
+    global _mount_table, _mounts, _block_index, _persistent_names
+    for cache in (_mount_table, _block_index, _persistent_names):
+        cache is not None and cache.close()
+    _mount_table = _mounts = _block_index = _persistent_names = None
+
+
+def _get_mounts_info():
+    # Yields device, filesystem, mount_point, mount_options of mounted devices (/dev/*)
+    for entry in mount_table():
+        if entry.source.startswith(_DEV):
+            yield entry.source[5:], entry.fstype, entry.mount_point, entry.options
 
 
 def _mount_info_dict() -> dict:
@@ -199,57 +514,284 @@ def mounts_info() -> dict:
     data = namedtuple("mounts", "filesystem mount_point mount_options")
     info = {dev: data(fs, mp, mo) for dev, fs, mp,  mo in _get_mounts_info()}
     if not info:
-        raise ValueNotFoundError("mounted partitions info", _MOUNTS, errno.ENODATA)
+        raise ValueNotFoundError("mounted partitions info", _MOUNTINFO, errno.ENODATA)
     return info
 
 
 def mounted_partitions() -> dict:
     """Returns a dict with mounted partitions and mount points"""
-    def get_mounts():
-        with open(_MOUNTS, "r") as file:
-            res = {}
-            for line in file.readlines():
-                prt = line.split()
-                if line.startswith("/"):
-                    res[prt[0]] = _fix_escapes(prt[1])
-            return res
-    mounts = get_mounts()
-    result = {partition: mounts[_DEV + partition] for partition in partitions() if _DEV + partition in mounts.keys()}
+    mounts = {dev: mp for dev, fs, mp, mo in _get_mounts_info()}
+    result = {partition: mounts[partition] for partition in partitions() if partition in mounts}
     if not result:
-        raise ValueNotFoundError("partitions", _MOUNTS, errno.ENODATA)
+        raise ValueNotFoundError("partitions", _MOUNTINFO, errno.ENODATA)
     return result
 
 
 def _get_stat(partition: str, cached=True):
+    # Mount points are cached until the mount table changes
     global _mounts
-    if _mounts is None or not cached:
-        _mounts = mounted_partitions()
+    mount_table(reload=not cached)
+    if _mounts is None or _mounts[0] != _mount_table.version:
+        _mounts = _mount_table.version, {dev: mp for dev, fs, mp, mo in _get_mounts_info()}
     try:
-        return statvfs(_mounts[partition])
+        return statvfs(_mounts[1][partition])
     except KeyError:
         raise PartitionNotMountError(_check_partitions(partition)[0])
 
 
-def _get_disks_stats():
-    # Returns sectors read/written * f_frsize
-    def get_bs(ptt, logical):
-        for dev in listdir(_BLOCK_DEV):
-            if dev in ptt:
-                with open("%s%s%s" % (_BLOCK_DEV, dev, _LB_SIZE if logical else _PB_SIZE), "rb") as fl:
-                    return int(fl.read())
-    global _bsize
+DiskCounters = namedtuple("DiskCounters", "reads reads_merged sectors_read read_time writes writes_merged "
+                                          "sectors_written write_time in_flight io_time weighted_io_time "
+                                          "discards discards_merged sectors_discarded discard_time flushes "
+                                          "flush_time")
+
+DiskIO = namedtuple("DiskIO", "r_s w_s d_s f_s rkb_s wkb_s dkb_s rrqm_s wrqm_s drqm_s r_await w_await d_await "
+                              "f_await rareq_sz wareq_sz dareq_sz aqu_sz util")
+
+_FIELDS = len(DiskCounters._fields)
+
+
+def _get_diskstats(devices=None) -> dict:
+    # -> dict: keys = devices, values = DiskCounters. Fields not provided by the kernel are 0
+    # (discards since Linux 4.18, flushes since 5.5). If devices is given, other lines are not split
     res = {}
-    with open(_DISKSTATS, "r") as f:
-        stat = f.readlines()
-        for line in stat:
-            ln = line.split()
-            partition = ln[2]
-            if _bsize is None:
-                _bsize = get_bs(partition, True)  # True: logical block size, False: Physical block size
-            res[str(partition)] = int(ln[5]) * _bsize, int(ln[9]) * _bsize
+    for line in read_lines(_DISKSTATS):
+        ln = line.split()
+        device = ln[2].decode()
+        if devices is None or device in devices:
+            values = list(map(int, ln[3:3 + _FIELDS]))
+            if len(values) < _FIELDS:
+                values.extend([0] * (_FIELDS - len(values)))
+            res[device] = DiskCounters._make(values)
     return res
 
 
+def io_counters(*devices: str) -> dict:
+    """Returns a dict with a DiskCounters namedtuple (all /proc/diskstats fields) per disk or partition
+
+        :Params:
+            :devices (str): Disks or partitions names (Ex: 'sda', 'sda1'). All of them if none is given
+
+    """
+    stat = _get_diskstats(devices or None)
+    for device in devices:
+        if device not in stat:
+            raise ValueNotFoundError(device, _DISKSTATS, errno.ENODEV)
+    return stat
+
+
+class _DiskSampler(Sampler):
+    # Base of the samplers of /proc/diskstats
+    _source = _DISKSTATS
+    _read_all = staticmethod(_get_diskstats)
+
+    def __init__(self, *devices: str, initialize=False):
+        self.devices = devices
+        super().__init__(initialize)
+
+    def _get_stat(self) -> dict:
+        return _get_diskstats(self.devices or None)
+
+    def _deltas(self, old_stat: dict, new_stat: dict) -> dict:
+        # -> dict: keys = devices, values = (old DiskCounters, new DiskCounters)
+        res = {}
+        for device in self.devices or new_stat.keys():
+            new = new_stat.get(device)
+            if new is None:
+                raise ValueNotFoundError(device, _DISKSTATS, errno.ENODEV)
+            res[device] = old_stat.get(device, new), new  # New device: there isn't a previous value
+        return res
+
+
+class IOStat(_DiskSampler):
+    """ Class to get extended I/O statistics (like iostat -x) of disks and partitions.
+
+            :Params:
+                :devices     (str): Disks or partitions names (Ex: 'sda', 'nvme0n1p2'). If none is
+                                    given, all devices in /proc/diskstats are sampled
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    next_value() returns a dict with a DiskIO namedtuple per device:
+
+        r_s, w_s, d_s, f_s:          reads, writes, discards and flushes completed per second
+        rkb_s, wkb_s, dkb_s:         KiB read, written and discarded per second
+        rrqm_s, wrqm_s, drqm_s:      requests merged per second
+        r_await, w_await, d_await,
+        f_await:                     average time (ms) of requests, including queue time
+        rareq_sz, wareq_sz, dareq_sz: average request size (KiB)
+        aqu_sz:                      average queue length
+        util:                        percentage of time the device had I/O in progress
+
+    /proc/diskstats is read once per sample for all the devices.
+    """
+    def _io(self, old_stat: dict, new_stat: dict, elapsed: float, precision: int) -> dict:
+        res = {}
+        elapsed_ms = elapsed * 1000
+        kib = _SECTOR_SIZE / 1024
+
+        def div(a, b):
+            return round(a / b, precision) if b else 0.0
+
+        for device, (old, new) in self._deltas(old_stat, new_stat).items():
+            d = DiskCounters._make(n - o for n, o in zip(new, old))
+            if not elapsed:
+                res[device] = DiskIO._make((0.0,) * len(DiskIO._fields))
+                continue
+            res[device] = DiskIO(div(d.reads, elapsed), div(d.writes, elapsed), div(d.discards, elapsed),
+                                 div(d.flushes, elapsed),
+                                 div(d.sectors_read * kib, elapsed), div(d.sectors_written * kib, elapsed),
+                                 div(d.sectors_discarded * kib, elapsed),
+                                 div(d.reads_merged, elapsed), div(d.writes_merged, elapsed),
+                                 div(d.discards_merged, elapsed),
+                                 div(d.read_time, d.reads), div(d.write_time, d.writes),
+                                 div(d.discard_time, d.discards), div(d.flush_time, d.flushes),
+                                 div(d.sectors_read * kib, d.reads), div(d.sectors_written * kib, d.writes),
+                                 div(d.sectors_discarded * kib, d.discards),
+                                 div(d.weighted_io_time, elapsed_ms),
+                                 min(div(d.io_time * 100, elapsed_ms), 100.0))
+        return res
+
+    def next_value(self, interval=0.0, precision=2) -> dict:
+        """Returns a dict with a DiskIO namedtuple per device
+
+            :Params:
+                :interval (float): Seconds. When value is greater than zero, it returns statistics in
+                                   that period of time. When interval value is 0, it returns
+                                   statistics since the last call
+                :precision  (int): Number of rounding decimals
+
+        """
+        return self._io(*self._get_pair(interval), precision)
+
+    async def anext_value(self, interval=0.0, precision=2) -> dict:
+        """Coroutine version of next_value(). It waits with asyncio.sleep()"""
+        return self._io(*await self._aget_pair(interval), precision)
+
+
+class DiskIOSampler(_DiskSampler):
+    """ Class to get bytes read and written in disks and partitions.
+
+            :Params:
+                :devices     (str): Disks or partitions names (Ex: 'sda', 'sda1'). If none is given,
+                                    all devices in /proc/diskstats are sampled
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    /proc/diskstats is read once per sample. Each instance keeps its own previous snapshot and
+    timestamp, so several instances (e.g. with different devices or cadences) don't interfere.
+    """
+    def _bytes(self, old_stat: dict, new_stat: dict, elapsed: float, per_second: bool) -> dict:
+        # -> dict: keys = devices, values = (read, written) bytes or bytes per second
+        res = {}
+        for device, (old, new) in self._deltas(old_stat, new_stat).items():
+            read_delta = (new.sectors_read - old.sectors_read) * _SECTOR_SIZE
+            write_delta = (new.sectors_written - old.sectors_written) * _SECTOR_SIZE
+            res[device] = ((read_delta, write_delta) if not per_second else (0.0, 0.0) if not elapsed else
+                           (read_delta / elapsed, write_delta / elapsed))
+        return res
+
+    @staticmethod
+    def _format(values: dict, scale: str, precision: int) -> dict:
+        return {device: set_bytes(read_, written, scale_in="bytes", scale_out=scale, precision=precision)
+                for device, (read_, written) in values.items()}
+
+    def next_value(self, interval=0.0, per_second=False, scale="KiB", precision=2) -> dict:
+        """Returns a dict with a tuple (read, written) per device
+
+            :Params:
+                :interval (float):  Seconds. When value is greater than zero, it returns bytes read
+                                    and written in that period of time. When interval value is 0,
+                                    it returns bytes read and written since the last call
+                :per_second (bool): If it's True returns average value per second
+                :scale      (str):  Output scale (bytes, KiB, MiB, GiB, TiB, kB, MB, TB or auto)
+                                    KiB by default
+                :precision  (int):  Number of rounding decimal
+
+        """
+        return self._format(self._bytes(*self._get_pair(interval), per_second), scale, precision)
+
+    async def anext_value(self, interval=0.0, per_second=False, scale="KiB", precision=2) -> dict:
+        """Coroutine version of next_value(). It waits with asyncio.sleep()"""
+        return self._format(self._bytes(*await self._aget_pair(interval), per_second), scale, precision)
+
+
+class StackedIOSampler(DiskIOSampler):
+    """ Class to get bytes read and written along stacked devices (LVM, dm-crypt, md RAID, multipath)
+
+            :Params:
+                :devices     (str): Stacked devices if by is 'members' (Ex: 'dm-0', 'md0') or disks
+                                    if by is 'disks' (Ex: 'nvme0n1'). If none is given, all stacked
+                                    devices or all disks are sampled
+                :by          (str): 'members': I/O of each device at the bottom of every stacked
+                                    device, e.g. RAID members (breakdown)
+                                    'disks': logical I/O of the devices at the top of every disk,
+                                    e.g. its logical volumes and unused partitions, added up (rollup)
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    The groups are computed from block_index() when the sampler is created, and again only when the
+    index is rebuilt (a block device is added or removed), so every sample just adds up the deltas of
+    precomputed tuples of devices.
+
+    The rollup is the logical I/O of the volumes hosted on each disk, not the I/O of the disk: a
+    volume spread over several disks counts fully in each one of them (e.g. a write to a RAID1 or a
+    striped volume adds its whole size to every member disk). The physical I/O of a disk is its own
+    /proc/diskstats row, sampled by DiskIOSampler(disk).
+    """
+    def __init__(self, *devices: str, by="members", initialize=False):
+        if by not in ("members", "disks"):
+            raise UnexpectedValueError("Unsupported grouping", by, ("members", "disks"))
+        self.groups = devices
+        self.by = by
+        self._index = None
+        self._plan = ()  # (group, (device, ...))
+        super().__init__(*self._update_plan(), initialize=initialize)
+
+    def _update_plan(self) -> tuple:
+        # Returns the devices needed by the plan
+        index = block_index()
+        if index is not self._index:
+            self._index = index
+            if self.by == "members":
+                groups = self.groups or sorted(name for name, number in index.names.items()
+                                               if index.devices[number].slaves)
+                self._plan = tuple((group, index.members(group)) for group in groups)
+            else:
+                groups = self.groups or sorted(name for name, number in index.names.items()
+                                               if not index.devices[number].partition
+                                               and not index.devices[number].slaves)
+                self._plan = tuple((group, index.tops(group)) for group in groups)
+            self.devices = tuple(sorted({device for _, group in self._plan for device in group}))
+        return self.devices
+
+    def _get_stat(self) -> dict:
+        self._update_plan()  # Before reading, so a device added to the index is read too
+        return super()._get_stat()
+
+    def _bytes(self, old_stat: dict, new_stat: dict, elapsed: float, per_second: bool) -> dict:
+        self._update_plan()  # Async pairs are read by shared_pair() for all devices
+        values = super()._bytes(old_stat, new_stat, elapsed, per_second) if self.devices else {}
+        if self.by == "members":
+            return {group: {device: values[device] for device in devices} for group, devices in self._plan}
+        return {group: (sum(values[device][0] for device in devices), sum(values[device][1] for device in devices))
+                for group, devices in self._plan}
+
+    @staticmethod
+    def _format(values: dict, scale: str, precision: int) -> dict:
+        return {group: (DiskIOSampler._format(value, scale, precision) if isinstance(value, dict) else
+                        set_bytes(*value, scale_in="bytes", scale_out=scale, precision=precision))
+                for group, value in values.items()}
+
+    def next_value(self, interval=0.0, per_second=False, scale="KiB", precision=2) -> dict:
+        """Returns a dict with a dict {member: (read, written)} per stacked device if by is 'members'
+        or a tuple (read, written) per disk if by is 'disks'. Same params as DiskIOSampler.next_value()
+        """
+        return super().next_value(interval, per_second, scale, precision)
+
+
 def total_size(partition: str, scale="GiB", precision=2):
     """Returns total size of a partition
 
@@ -305,33 +847,184 @@ def used_space_percent(partition: str, precision=2) -> float:
     return round((stat.f_blocks - stat.f_bfree) / stat.f_blocks * 100, precision)
 
 
-def _set_delta(*partitions_: str, interval=0.0, persecond=False):
-    # TODO: add type hint
+Usage = namedtuple("Usage", "device fstype total free available used files files_free files_available")
+
+
+class _StatvfsPool:
+    # Bounded pool of daemon threads. statvfs can hang forever on a dead NFS/FUSE mount, so threads
+    # must not block interpreter exit (as ThreadPoolExecutor ones do). A thread is added for each
+    # hung call (up to 4 times the initial number), so hung mounts don't starve the other ones
+    def __init__(self, workers: int):
+        self._queue = SimpleQueue()
+        self._lock = Lock()
+        self.workers = workers
+        self.threads = 0
+        self.running = set()  # Futures of the calls in progress
+        with self._lock:
+            for i in range(workers):
+                self._spawn()
+
+    def _spawn(self):
+        # It must be called holding the lock
+        self.threads += 1
+        Thread(target=self._run, name="statux-statvfs-%d" % self.threads, daemon=True).start()
+
+    def _run(self):
+        while True:
+            future, mount_point = self._queue.get()
+            with self._lock:
+                future.started = monotonic()
+                self.running.add(future)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(statvfs(mount_point))
+                except BaseException as ex:
+                    future.set_exception(ex)
+            with self._lock:
+                self.running.discard(future)
+                if future.replaced:  # Another thread took its place while it was hung
+                    self.threads -= 1
+                    return
+
+    def hung(self, timeout: float) -> int:
+        # Returns the number of threads blocked in a call that has been running for more than timeout
+        now = monotonic()
+        with self._lock:
+            return sum(1 for future in self.running if now - future.started >= timeout)
+
+    def replace_hung(self, future: Future):
+        # Adds a thread to replace the one blocked in a hung call. It finishes when the call returns
+        with self._lock:
+            if not future.done() and not future.replaced and self.threads < self.workers * 4:
+                future.replaced = True
+                self._spawn()
+
+    def submit(self, mount_point: str) -> Future:
+        future = Future()
+        future.started = None    # monotonic time when a thread has picked it up
+        future.replaced = False  # True if a thread has been added to replace the hung one
+        self._queue.put((future, mount_point))
+        return future
+
+
+def stale_mounts() -> list:
+    """Returns a list with mount points whose statvfs timed out. They're retried with backoff"""
+    with _usage_lock:
+        return list(_stale)
+
+
+def _mark_stale(mount_point: str):
+    # Backoff is doubled on every timeout
+    backoff = min(max(_stale.get(mount_point, (0.0, 0.0))[1] * 2, _BACKOFF_MIN), _BACKOFF_MAX)
+    _stale[mount_point] = monotonic() + backoff, backoff
+
+
+def _wait_statvfs(futures: list, timeout: float):
+    # Waits until every call is done or has been running for more than timeout seconds. As soon as
+    # a call times out, a thread replaces the hung one, so the queued calls still run in this sweep.
+    # It returns earlier if the queued calls can't start because every thread is blocked in a hung
+    # call and the pool can't grow anymore
+    pending = set(futures)
+    while pending:
+        now = monotonic()
+        for future in [future for future in pending if future.started is not None and now - future.started >= timeout]:
+            _statvfs_pool.replace_hung(future)
+            pending.discard(future)
+        deadlines = [future.started + timeout for future in pending if future.started is not None]
+        if not pending or not deadlines and _statvfs_pool.hung(timeout) >= _statvfs_pool.threads:
+            return
+        pending = wait(pending, min(deadlines) - now if deadlines else timeout, FIRST_COMPLETED)[1]
+        if not deadlines and all(future.started is None for future in pending):
+            return  # No thread has picked them up in timeout seconds
+
+
+def usage_all(timeout=1.0, workers=8) -> dict:
+    """Returns a dict with mount points as keys and Usage namedtuples as values
+
+        Usage fields are device, fstype, total, free, available, used (bytes), files, files_free
+        and files_available (inodes). Filesystems without blocks (proc, sysfs, etc) are skipped.
+
+        statvfs is called in parallel for every mount point. Mount points whose call doesn't
+        return within the timeout since it started (e.g. hung NFS or FUSE mounts) are marked as
+        stale (see stale_mounts()) and skipped in later calls until a backoff time (5 seconds,
+        doubled on every timeout up to 5 minutes) has elapsed and the hung call has returned.
+        A thread is added to the pool for each hung call, so the other mount points are still
+        checked. If the pool can't grow anymore, the ones that couldn't be checked are skipped and
+        retried in the next call.
+
+        :Params:
+            :timeout (float): Seconds to wait for each statvfs call
+            :workers   (int): Number of threads of the pool (only used in the first call)
+
+    """
+    with _usage_lock:
+        return _usage_all(timeout, workers)
+
+
+def _usage_all(timeout: float, workers: int) -> dict:
+    global _statvfs_pool
+    if _statvfs_pool is None:
+        _statvfs_pool = _StatvfsPool(workers)
+    entries = {entry.mount_point: entry for entry in mount_table()}  # Last entry is the visible one
+    for mount_point in [mount_point for mount_point in _pending if mount_point not in entries]:  # Unmounted
+        _pending.pop(mount_point)
+    for mount_point in [mount_point for mount_point in _stale if mount_point not in entries]:
+        _stale.pop(mount_point)
+    now = monotonic()
+    futures = {}
+    for mount_point in sorted(entries, key=lambda mount_point: mount_point in _stale):  # Stale ones last
+        if mount_point in _pending and not _pending[mount_point].done():
+            continue  # Previous call is still hung
+        retry = _stale.get(mount_point)
+        if retry is not None and now < retry[0]:
+            continue
+        futures[mount_point] = _pending[mount_point] = _statvfs_pool.submit(mount_point)
+    _wait_statvfs(list(futures.values()), timeout)
+    res = {}
+    for mount_point, future in futures.items():
+        if not future.done():
+            if future.cancel():  # Queued behind hung calls. It couldn't be checked
+                _pending.pop(mount_point, None)
+            elif monotonic() - future.started >= timeout:
+                _mark_stale(mount_point)
+            continue
+        _pending.pop(mount_point, None)
+        _stale.pop(mount_point, None)
+        try:
+            st = future.result()
+        except OSError:
+            continue
+        if not st.f_blocks:
+            continue
+        entry = entries[mount_point]
+        res[mount_point] = Usage(entry.source, entry.fstype, st.f_frsize * st.f_blocks, st.f_frsize * st.f_bfree,
+                                 st.f_frsize * st.f_bavail, st.f_frsize * (st.f_blocks - st.f_bfree),
+                                 st.f_files, st.f_ffree, st.f_favail)
+    return res
+
+
+def _get_sampler(partitions_: tuple) -> DiskIOSampler:
+    sampler = _samplers.get(partitions_)
+    if sampler is None:
+        sampler = _samplers[partitions_] = DiskIOSampler(*partitions_)
+    return sampler
+
+
+def _result(partitions_: tuple, dic: dict):
     # With one partition returns a tuple (read, written)
     # with more than one returns a  dict {part1: (read, written), part2: (read, written), ...}
-    from time import sleep, time
-    global _last
-    if _last is None or interval > 0.0:
-        _check_partitions(*partitions_)
-        old_stat = _get_disks_stats()
-        sleep(interval)
-        elapsed = interval
-    else:
-        old_stat = _last[0]
-        elapsed = round(time() - _last[1], 3)  # milliseconds
-    new_stat = _get_disks_stats()
-    _last = new_stat, time()
-    dic = {}
-    for partition in partitions_:
-        read_delta = new_stat[partition][0] - old_stat[partition][0]
-        write_delta = new_stat[partition][1] - old_stat[partition][1]
-        res = ((read_delta, write_delta) if not persecond else (0.0, 0.0) if not elapsed else
-               (read_delta / elapsed, write_delta / elapsed))
-        if len(partitions_) < 2:
-            return res
-        else:
-            dic[partition] = res
-    return dic
+    return dic[partitions_[0]] if len(partitions_) < 2 else dic
+
+
+def _set_delta(*partitions_: str, interval=0.0, persecond=False):
+    sampler = _get_sampler(partitions_)
+    return _result(partitions_, sampler._bytes(*sampler._get_pair(interval), persecond))
+
+
+async def _aset_delta(*partitions_: str, interval=0.0, persecond=False):
+    # Coroutine version of _set_delta. Concurrent awaiters with the same interval share the reads
+    sampler = _get_sampler(partitions_)
+    return _result(partitions_, sampler._bytes(*await sampler._aget_pair(interval), persecond))
 
 
 def bytes_read(partition: str, interval=0.0, per_second=False, scale="KiB", precision=2):
@@ -406,3 +1099,35 @@ def bytes_read_write_multi(*partitions_: str, interval=0.0, per_second=False, sc
     for key, value in dic.items():
         dic[key] = set_bytes(value[0], value[1], scale_in="bytes", scale_out=scale, precision=precision)
     return dic
+
+
+async def abytes_read(partition: str, interval=0.0, per_second=False, scale="KiB", precision=2):
+    """Coroutine version of bytes_read(). It waits with asyncio.sleep()"""
+    return set_bytes((await _aset_delta(partition, interval=interval, persecond=per_second))[0],
+                     scale_in="bytes", scale_out=scale, precision=precision)
+
+
+async def abytes_write(partition: str, interval=0.0, per_second=False, scale="KiB", precision=2):
+    """Coroutine version of bytes_write(). It waits with asyncio.sleep()"""
+    return set_bytes((await _aset_delta(partition, interval=interval, persecond=per_second))[1],
+                     scale_in="bytes", scale_out=scale, precision=precision)
+
+
+async def abytes_read_write(partition: str, interval=0.0, per_second=False, scale="KiB", precision=2) -> tuple:
+    """Coroutine version of bytes_read_write(). It waits with asyncio.sleep()"""
+    values = await _aset_delta(partition, interval=interval, persecond=per_second)
+    return set_bytes(values[0], values[1], scale_in="bytes", scale_out=scale, precision=precision)
+
+
+async def abytes_read_write_multi(*partitions_: str, interval=0.0, per_second=False, scale="KiB",
+                                  precision=2) -> dict:
+    """Coroutine version of bytes_read_write_multi(). It waits with asyncio.sleep()
+
+    Concurrent awaiters asking for the same interval share the reads of /proc/diskstats
+    """
+    dic = await _aset_delta(*partitions_, interval=interval, persecond=per_second)
+    if type(dic) == tuple:
+        dic = {partitions_[0]: dic}
+    for key, value in dic.items():
+        dic[key] = set_bytes(value[0], value[1], scale_in="bytes", scale_out=scale, precision=precision)
+    return dic
@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+import errno
+import re
+from collections import namedtuple
+from os import listdir
+from os.path import join
+from statux._conversions import set_celsius, set_volts, set_amperes, set_watts, set_joules
+from statux._errors import ValueNotFoundError, ex_handler
+from statux._reader import Reader, read_once, on_close
+
+_HWMON = "/sys/class/hwmon/"
+_THERMAL = "/sys/class/thermal/"
+
+# Sensor classes of the hwmon sysfs interface (Documentation/hwmon/sysfs-interface) and the
+# attributes with their value. Power meters may only have power*_average
+_KINDS = {"temp": ("input",), "fan": ("input",), "in": ("input",), "curr": ("input",),
+          "power": ("average", "input"), "energy": ("input",), "humidity": ("input",)}
+_THRESHOLDS = ("min", "max", "crit")
+_ATTRIBUTE = re.compile(r"^(%s)(\d+)_(input|average)$" % "|".join(_KINDS))
+
+# Cache:
+_index = None
+
+Sensor = namedtuple("Sensor", "kind chip label input min max crit")
+
+# Records returned by HwmonIndex.sample(). Thresholds are None if the chip doesn't provide them
+_FIELDS = "chip label value min max crit"
+Temperature = namedtuple("Temperature", _FIELDS)  # Celsius, Fahrenheit, Kelvin or Rankine
+Fan = namedtuple("Fan", _FIELDS)                  # RPM
+Voltage = namedtuple("Voltage", _FIELDS)          # V or mV
+Current = namedtuple("Current", _FIELDS)          # A or mA
+Power = namedtuple("Power", _FIELDS)              # W, mW or uW
+Energy = namedtuple("Energy", _FIELDS)            # J, kJ, Wh or uJ
+Humidity = namedtuple("Humidity", _FIELDS)        # %
+ThermalZone = namedtuple("ThermalZone", "zone type temp trips")
+TripPoint = namedtuple("TripPoint", "type temp")
+
+_RECORDS = {"temp": Temperature, "fan": Fan, "in": Voltage, "curr": Current, "power": Power, "energy": Energy,
+            "humidity": Humidity}
+
+
+def _read_int(path: str):
+    # Returns the int value of a static attribute or None if it doesn't exist or can't be read
+    try:
+        return int(read_once(path))
+    except (OSError, ValueError):
+        return None
+
+
+def _sort_key(name: str) -> tuple:
+    # Natural order: 'temp2_input' < 'temp10_input', 'hwmon2' < 'hwmon10'
+    return tuple(int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name))
+
+
+class HwmonIndex:
+    """ Index of every hwmon sensor (temperatures, fans, voltages, currents, power, energy and
+    humidity) and thermal zone
+
+            :Params:
+                :parent  (str): hwmon directory, /sys/class/hwmon/ by default
+                :kinds (tuple): Sensor classes to index. All by default
+                :thermal (bool): If True, /sys/class/thermal/thermal_zone* are indexed too
+
+
+    Sensors are discovered once: labels (or 'fan1', 'in0', etc if a sensor has no label) and
+    min/max/crit thresholds are read when the index is built, and the descriptor of every input is
+    kept open. So each sample is a single batched pass of preads. Use index() to get the index,
+    it's rebuilt when a hwmon directory or a thermal zone is added or removed.
+    """
+    def __init__(self, parent=_HWMON, kinds=tuple(_KINDS), thermal=True):
+        self.parent = parent
+        self.thermal = thermal
+        self._hwmons = frozenset(listdir(parent))
+        self._zones = self._list_zones() if thermal else frozenset()
+        self.sensors = []
+        self._readers = []
+        for hwmon in sorted(self._hwmons, key=_sort_key):
+            self._add_chip(join(parent, hwmon), hwmon, kinds)
+        self.zones = []  # (zone, type, trip points, Reader)
+        for zone in sorted(self._zones, key=_sort_key):
+            self._add_zone(join(_THERMAL, zone), zone)
+
+    def _add_chip(self, pth: str, hwmon: str, kinds: tuple):
+        try:
+            chip = read_once(join(pth, "name")).strip().decode()
+        except OSError:
+            chip = hwmon
+        found = {}  # sensor -> attribute of the value
+        for file in listdir(pth):
+            match = _ATTRIBUTE.match(file)
+            if match and match.group(1) in kinds:
+                sensor = match.group(1) + match.group(2)
+                attributes = _KINDS[match.group(1)]
+                if sensor not in found or attributes.index(match.group(3)) < attributes.index(found[sensor]):
+                    found[sensor] = match.group(3)
+        for sensor in sorted(found, key=_sort_key):
+            kind = sensor.rstrip("0123456789")
+            path = join(pth, "%s_%s" % (sensor, found[sensor]))
+            try:
+                label = read_once(join(pth, sensor + "_label")).strip().decode()
+            except OSError:
+                label = sensor
+            try:
+                self._readers.append(Reader(path, 32))
+            except OSError:  # Sensor not readable
+                continue
+            self.sensors.append(Sensor(kind, chip, label, path,
+                                       *(_read_int(join(pth, "%s_%s" % (sensor, t))) for t in _THRESHOLDS)))
+
+    @staticmethod
+    def _list_zones() -> frozenset:
+        try:
+            return frozenset(zone for zone in listdir(_THERMAL) if zone.startswith("thermal_zone"))
+        except FileNotFoundError:
+            return frozenset()
+
+    def _add_zone(self, pth: str, zone: str):
+        try:
+            type_ = read_once(join(pth, "type")).strip().decode()
+            reader = Reader(join(pth, "temp"), 32)
+        except OSError:
+            return
+        trips = []
+        for file in sorted(listdir(pth), key=_sort_key):
+            if file.startswith("trip_point_") and file.endswith("_type"):
+                try:
+                    trip_type = read_once(join(pth, file)).strip().decode()
+                except OSError:
+                    continue
+                trips.append((trip_type, _read_int(join(pth, file[:-len("type")] + "temp"))))
+        self.zones.append((zone, type_, tuple(trips), reader))
+
+    def is_current(self) -> bool:
+        """Returns False if a hwmon directory or a thermal zone has been added or removed"""
+        return (frozenset(listdir(self.parent)) == self._hwmons and
+                (not self.thermal or self._list_zones() == self._zones))
+
+    def read(self) -> list:
+        """Returns a list with the raw values of the sensors (e.g.: millidegrees Celsius, RPM, mV) in the
+        order of sensors. Values of sensors that can't be read are None"""
+        return [self._read_value(reader) for reader in self._readers]
+
+    @staticmethod
+    def _read_value(reader: Reader):
+        # Some sensors can't always be read (e.g.: ENODATA when a fan is not connected, EAGAIN
+        # when a device is suspended)
+        try:
+            return int(reader.read())
+        except (OSError, ValueError):
+            return None
+
+    def _required(self, values: list, position: int) -> int:
+        # Returns the value of a sensor got by read(). Raises ValueNotFoundError if it couldn't be read
+        if values[position] is None:
+            sensor = self.sensors[position]
+            raise ValueNotFoundError("%s value" % sensor.label, sensor.input, errno.ENODATA)
+        return values[position]
+
+    def sample(self, temp_scale="celsius", volt_scale="V", current_scale="A", power_scale="W",
+               energy_scale="J", precision=2) -> dict:
+        """ Returns a dict with sensor classes ('temp', 'fan', 'in', 'curr', 'power', 'energy',
+        'humidity' and 'thermal') as keys and lists of records as values
+
+            :Params:
+                :temp_scale    (str): Celsius, Fahrenheit, Kelvin or Rankine
+                :volt_scale    (str): V or mV
+                :current_scale (str): A or mA
+                :power_scale   (str): W, mW or uW
+                :energy_scale  (str): J, kJ, Wh or uJ
+                :precision     (int): Number of rounding decimals
+
+
+        Values of sensors that can't be read are None
+        """
+        convert = {"temp": lambda v: set_celsius(v, temp_scale, precision),
+                   "fan": lambda v: v,
+                   "in": lambda v: set_volts(v, volt_scale, precision),
+                   "curr": lambda v: set_amperes(v, current_scale, precision),
+                   "power": lambda v: set_watts(v, power_scale, precision),
+                   "energy": lambda v: set_joules(v, energy_scale, precision),
+                   "humidity": lambda v: round(v / 1000, precision)}
+        res = {kind: [] for kind in _KINDS}
+        for sensor, reader in zip(self.sensors, self._readers):
+            fun = convert[sensor.kind]
+            values = (self._read_value(reader), sensor.min, sensor.max, sensor.crit)
+            res[sensor.kind].append(_RECORDS[sensor.kind](sensor.chip, sensor.label,
+                                                          *(fun(v) if v is not None else None for v in values)))
+        res["thermal"] = [ThermalZone(zone, type_, self._temp(self._read_value(reader), temp_scale, precision),
+                                      tuple(TripPoint(t, self._temp(temp, temp_scale, precision)) for t, temp in trips))
+                          for zone, type_, trips, reader in self.zones]
+        return res
+
+    @staticmethod
+    def _temp(value, scale: str, precision: int):
+        return set_celsius(value, scale, precision) if value is not None else None
+
+    def close(self):
+        for reader in self._readers:
+            reader.close()
+        for zone in self.zones:
+            zone[-1].close()
+
+
+@ex_handler(_HWMON, "hwmon sensors")
+def index() -> HwmonIndex:
+    """Returns the cached HwmonIndex. It's rebuilt when a hwmon directory or thermal zone changes"""
+    global _index
+    if _index is None or not _index.is_current():
+        _index is not None and _index.close()
+        _index = HwmonIndex()
+    return _index
+
+
+@on_close
+def _close_index():
+    # Closes the descriptors of the cached HwmonIndex (called by statux.close())
+    global _index
+    _index is not None and _index.close()
+    _index = None
+
+
+def sample(temp_scale="celsius", volt_scale="V", current_scale="A", power_scale="W", energy_scale="J",
+           precision=2) -> dict:
+    """Returns every hwmon sensor and thermal zone in one pass. Same params as HwmonIndex.sample()"""
+    return index().sample(temp_scale, volt_scale, current_scale, power_scale, energy_scale, precision)
@@ -14,85 +14,395 @@
 # (ɔ) Iván Rincón 2019
 
 import errno
+from socket import MSG_DONTWAIT
+from threading import Lock
+from statux import _netlink
 from statux._conversions import set_bytes
-from statux._errors import ValueNotFoundError
+from statux._errors import ValueNotFoundError, UnexpectedValueError
+from statux._monitor import Monitor
+from statux._reader import read_lines
+from statux._sampler import Sampler
+from collections import namedtuple
+from struct import Struct
+from typing import Union
 
 
 _PROC_STAT = "/proc/net/dev"
 _SYS_NET_PTH = "/sys/class/net/"
 
 # Cache:
-_last = None
-_interfaces_checked = []
+_samplers = {}  # interface -> NetSampler used by module methods
+_route = None   # RouteSocket when netlink backend is enabled
+_route_lock = Lock()  # Serializes the dumps of _route
+_registry = None  # InterfaceRegistry started by start_registry()
+
+_STATS64 = Struct("=23Q")  # First 23 fields of struct rtnl_link_stats64
+_MTU = Struct("=I")
+_IFF_UP = 0x1
+_OPERSTATES = ("unknown", "notpresent", "down", "lowerlayerdown", "testing", "dormant", "up")  # IF_OPER_*
+
+
+NetCounters = namedtuple("NetCounters", "rx_bytes rx_packets rx_errs rx_drop rx_fifo rx_frame rx_compressed "
+                                        "rx_multicast tx_bytes tx_packets tx_errs tx_drop tx_fifo tx_colls "
+                                        "tx_carrier tx_compressed")
+
+
+def _from_stats64(data: memoryview) -> NetCounters:
+    # struct rtnl_link_stats64 to NetCounters as they are shown in /proc/net/dev (see dev_seq_printf_stats)
+    s = _STATS64.unpack_from(data)
+    return NetCounters(s[2], s[0], s[4], s[6] + s[15], s[14], s[10] + s[11] + s[12] + s[13], s[21], s[8],
+                       s[3], s[1], s[5], s[7], s[18], s[9], s[17] + s[16] + s[20] + s[19], s[22])
+
+
+def _get_netlink_stat(interfaces=None) -> dict:
+    # -> dict: keys = interfaces, values = NetCounters. Data is got from IFLA_STATS64 of a RTM_GETLINK dump
+    res = {}
+    for type_, ifi, attrs in _route.dump_links():
+        name = attrs.get(_netlink.IFLA_IFNAME)
+        stats = attrs.get(_netlink.IFLA_STATS64)
+        if name is not None and stats is not None:
+            name = name.tobytes().rstrip(b"\0").decode()
+            if interfaces is None or name in interfaces:
+                res[name] = _from_stats64(stats)
+    return res
 
 
-def _get_stat():
-    with open(_PROC_STAT, "r") as file:
-        stat = file.readlines()
-        res = {}
-        for i in range(2, len(stat)):
-            ln = stat[i].split()
-            res[ln[0][:-1]] = (int(ln[1]), int(ln[9]))
-        return res
+def set_backend(backend: str) -> str:
+    """ Sets where network counters are read from and returns the backend finally used
+
+        :Params:
+            :backend (str): 'procfs' (parse /proc/net/dev, default) or 'netlink' (one RTM_GETLINK
+                            dump, faster on hosts with thousands of interfaces). If netlink is not
+                            available, procfs is used.
+
+    """
+    global _route
+    if backend not in ("procfs", "netlink"):
+        raise UnexpectedValueError("Unsupported backend", backend, ("procfs", "netlink"))
+    with _route_lock:
+        if _route is not None:
+            _route.close()
+            _route = None
+        if backend == "netlink":
+            try:
+                _route = _netlink.RouteSocket()
+            except OSError:
+                return "procfs"
+    return backend
+
+
+def _get_stat(interfaces=None) -> dict:
+    # -> dict: keys = interfaces, values = NetCounters
+    # If interfaces is given, lines of other interfaces are not split
+    global _route
+    if _route is not None:
+        with _route_lock:
+            try:
+                if _route is not None:
+                    return _get_netlink_stat(interfaces)
+            except OSError:  # Netlink is not available anymore. Falling back to procfs
+                _route.close()
+                _route = None
+    res = {}
+    for line in read_lines(_PROC_STAT)[2:]:
+        name, _, values = line.partition(b":")
+        name = name.strip().decode()
+        if interfaces is None or name in interfaces:
+            res[name] = NetCounters._make(map(int, values.split()))
+    return res
 
 
 def _check_interface(interface: str, stat: dict):
-    if interface not in _interfaces_checked:
-        if interface not in stat.keys():
-            raise ValueNotFoundError(interface, _PROC_STAT, errno.ENODEV)
-        else:
-            _interfaces_checked.append(interface)
+    if interface not in stat:
+        raise ValueNotFoundError(interface, _PROC_STAT, errno.ENODEV)
     return interface
 
 
 def _get_bytes(interface: str, direction: int):
     # param direction:  Download: 0, Upload: 1, Both: 2
-    stat = _get_stat()
-    _check_interface(interface, stat)
-    for key, value in stat.items():
-        if key == interface:
-            return value[direction] if direction != 2 else value
+    stat = _get_stat((interface,))
+    value = stat[_check_interface(interface, stat)]
+    return (value.rx_bytes, value.tx_bytes, (value.rx_bytes, value.tx_bytes))[direction]
+
+
+class NetSampler(Sampler):
+    """ Class to get average download and upload speed per second of network interfaces.
+
+            :Params:
+                :interfaces  (str): Interfaces names. If none is given, all interfaces are sampled
+                :initialize (bool): When initialize is True, next_value() is called to set the first
+                                    snapshot, so next_value(interval=0) returns a real value the
+                                    first time
+
+
+    /proc/net/dev is read once per sample for all the interfaces. Each instance keeps its own
+    previous snapshot, so several instances don't interfere with each other.
+    """
+    _source = _PROC_STAT
+    _read_all = staticmethod(_get_stat)
+
+    def __init__(self, *interfaces: str, initialize=False):
+        self.interfaces = interfaces
+        super().__init__(initialize)
+
+    def _get_stat(self) -> dict:
+        return _get_stat(self.interfaces or None)
+
+    def _deltas(self, old_stat: dict, new_stat: dict) -> dict:
+        # -> dict: keys = interfaces, values = (old NetCounters, new NetCounters)
+        names = self.interfaces or new_stat.keys()
+        res = {}
+        for name in names:
+            new = new_stat.get(name)
+            if new is None:
+                raise ValueNotFoundError(name, _PROC_STAT, errno.ENODEV)
+            res[name] = old_stat.get(name, new), new  # New interface: there isn't a previous value
+        return res
+
+    def _rates(self, old_stat: dict, new_stat: dict, elapsed: float) -> dict:
+        # -> dict: keys = interfaces, values = (download, upload) bytes per second
+        return {name: (0.0, 0.0) if not elapsed else
+                ((new.rx_bytes - old.rx_bytes) / elapsed, (new.tx_bytes - old.tx_bytes) / elapsed)
+                for name, (old, new) in self._deltas(old_stat, new_stat).items()}
+
+    def _counters_rates(self, old_stat: dict, new_stat: dict, elapsed: float, precision: int) -> dict:
+        # -> dict: keys = interfaces, values = NetCounters per second
+        return {name: NetCounters._make(round((n - o) / elapsed, precision) if elapsed else 0.0
+                                        for o, n in zip(old, new))
+                for name, (old, new) in self._deltas(old_stat, new_stat).items()}
+
+    def _format(self, rates: dict, as_dict: bool, scale: str, precision: int) -> Union[dict, list]:
+        res = {name: set_bytes(down, up, scale_in="bytes", scale_out=scale, precision=precision)
+               for name, (down, up) in rates.items()}
+        return res if as_dict else list(res.values())
+
+    def next_value(self, interval=0.0, as_dict=True, scale="bytes", precision=2) -> Union[dict, list]:
+        """Returns average download and upload speed per second of the sampled interfaces
+
+            :Params:
+                :interval (float): Seconds. When value is greater than zero, it returns speeds in that
+                                   period of time. When interval value is 0, it returns speeds since
+                                   the last call
+                :as_dict   (bool): If it's True returns a dict {interface: (download, upload), ...},
+                                   a list of tuples (download, upload) in interfaces order otherwise
+                :scale      (str): Chosen scale (bytes, KiB, MiB, GiB, TiB, kB, Mb, GB, TB or auto)
+                :precision  (int): Number of rounding decimals
+
+        """
+        return self._format(self._rates(*self._get_pair(interval)), as_dict, scale, precision)
+
+    async def anext_value(self, interval=0.0, as_dict=True, scale="bytes", precision=2) -> Union[dict, list]:
+        """Coroutine version of next_value(). It waits with asyncio.sleep()"""
+        return self._format(self._rates(*await self._aget_pair(interval)), as_dict, scale, precision)
+
+    def next_counters(self, interval=0.0, precision=2) -> dict:
+        """Returns a dict with a NetCounters per interface with the average of every counter per second
+
+            bytes, packets, errs, drop, fifo, frame, compressed and multicast received and bytes,
+            packets, errs, drop, fifo, colls, carrier and compressed transmitted.
+
+            :Params:
+                :interval (float): Seconds. When value is greater than zero, it returns rates in that
+                                   period of time. When interval value is 0, it returns rates since
+                                   the last call
+                :precision  (int): Number of rounding decimals
+
+        """
+        return self._counters_rates(*self._get_pair(interval), precision)
+
+    async def anext_counters(self, interval=0.0, precision=2) -> dict:
+        """Coroutine version of next_counters(). It waits with asyncio.sleep()"""
+        return self._counters_rates(*await self._aget_pair(interval), precision)
+
+
+def _get_sampler(interface: str) -> NetSampler:
+    sampler = _samplers.get(interface)
+    if sampler is None:
+        sampler = _samplers[interface] = NetSampler(interface)
+    return sampler
 
 
 def _set_delta(interface: str, interval=0.0):
-    # Speed average per second
-    # param direction:  Download: 0, Upload: 1
-    from time import sleep, time
-    global _last
-    if _last is None or interval > 0.0:
-        # print("Debug. Sleeping %d seconds" % interval)
-        old_stat = _get_stat()
-        sleep(interval)
-        elapsed = interval
-    else:
-        # print("Debug. Not sleeping")
-        old_stat = _last[0]
-        elapsed = round(time() - _last[1], 3)  # milliseconds
-    new_stat = _get_stat()
-    _check_interface(interface, new_stat)
-    _last = new_stat, time()
-    delta = new_stat[interface][0] - old_stat[interface][0], new_stat[interface][1] - old_stat[interface][1]
-    return (0.0, 0.0) if not elapsed else (delta[0] / elapsed, delta[1] / elapsed)
+    # Speed average per second. Every interface has its own previous snapshot
+    sampler = _get_sampler(interface)
+    return sampler._rates(*sampler._get_pair(interval))[interface]
+
+
+async def _aset_delta(interface: str, interval=0.0):
+    # Coroutine version of _set_delta. Concurrent awaiters with the same interval share the reads
+    sampler = _get_sampler(interface)
+    return sampler._rates(*await sampler._aget_pair(interval))[interface]
+
+
+Interface = namedtuple("Interface", "name index address operstate mtu")
+
+
+class InterfaceRegistry(Monitor):
+    """ In-memory map of network interfaces kept up to date by netlink link notifications
+
+    It subscribes to RTNLGRP_LINK and dumps all links once, so lookups don't read any file. Callbacks
+    can be registered with on() for 'add', 'remove', 'up', 'down' and 'change' (any other attribute)
+    events. They receive an Interface namedtuple (name, index, address, operstate, mtu).
+
+    Pending notifications are processed by every lookup, or by a background thread after start().
+    See _monitor.Monitor for the callbacks and thread semantics.
+    """
+    _EVENTS = ("add", "remove", "up", "down", "change")
+    _THREAD_NAME = "statux-interfaces"
+
+    def __init__(self):
+        super().__init__()
+        self._socket = _netlink.RouteSocket(_netlink.RTMGRP_LINK)
+        self._interfaces = {}  # index -> Interface
+        self._names = {}       # name -> index
+        self._up = {}          # index -> bool
+        self._sync()
+
+    def _sync(self):
+        # Dumps all links. Used at start and when notifications were lost (ENOBUFS)
+        with self._lock:
+            old = set(self._interfaces)
+            self._process(self._socket.dump_links())
+            for index in old - self._seen:
+                self._remove(index)
+        self._dispatch()
+
+    def _process(self, messages):
+        self._seen = set()
+        events = []
+        for type_, ifi, attrs in messages:
+            index = ifi[2]
+            if type_ == _netlink.RTM_DELLINK:
+                self._remove(index)
+                continue
+            name = attrs.get(_netlink.IFLA_IFNAME)
+            if name is None:
+                continue
+            address = attrs.get(_netlink.IFLA_ADDRESS)
+            operstate = attrs.get(_netlink.IFLA_OPERSTATE)
+            mtu = attrs.get(_netlink.IFLA_MTU)
+            interface = Interface(name.tobytes().rstrip(b"\0").decode(), index,
+                                  ":".join("%02x" % b for b in address) if address is not None else "",
+                                  _OPERSTATES[operstate[0]] if operstate is not None and operstate[0] < 7
+                                  else "unknown",
+                                  _MTU.unpack(mtu)[0] if mtu is not None else 0)
+            # Drivers that don't report operational state are 'unknown' when they are administratively up
+            up = interface.operstate == "up" or (interface.operstate == "unknown" and bool(ifi[3] & _IFF_UP))
+            self._seen.add(index)
+            old = self._interfaces.get(index)
+            if old is not None and old.name != interface.name:  # Renamed
+                self._remove(index)
+                old = None
+            was_up = self._up.get(index)
+            self._interfaces[index] = interface
+            self._names[interface.name] = index
+            self._up[index] = up
+            if old is None:
+                self._notify("add", interface)
+            elif was_up != up:
+                self._notify("up" if up else "down", interface)
+            elif old != interface:
+                self._notify("change", interface)
+
+    def _remove(self, index: int):
+        interface = self._interfaces.pop(index, None)
+        self._up.pop(index, None)
+        if interface is not None:
+            self._names.pop(interface.name, None)
+            self._notify("remove", interface)
+
+    def _receive(self):
+        # Processes the pending notifications until the socket would block
+        while True:
+            try:
+                with self._lock:
+                    self._process(self._socket.events(MSG_DONTWAIT))
+            except BlockingIOError:
+                return
+            except OSError as ex:
+                if ex.errno != errno.ENOBUFS:
+                    raise
+                self._sync()  # Socket buffer overflowed. Some notifications have been lost
+            finally:
+                self._dispatch()
+
+    def interfaces(self) -> dict:
+        """Returns a dict with interfaces names as keys and Interface namedtuples as values"""
+        self.update()
+        with self._lock:
+            return {interface.name: interface for interface in self._interfaces.values()}
+
+    def __getitem__(self, name: str) -> Interface:
+        self.update()
+        with self._lock:
+            try:
+                return self._interfaces[self._names[name]]
+            except KeyError:
+                raise ValueNotFoundError(name, _SYS_NET_PTH, errno.ENODEV)
+
+    def __contains__(self, name: str) -> bool:
+        self.update()
+        with self._lock:
+            return name in self._names
+
+
+def start_registry() -> InterfaceRegistry:
+    """Starts a shared InterfaceRegistry. get_interfaces(), get_address() and get_state() will use it"""
+    global _registry
+    if _registry is None:
+        _registry = InterfaceRegistry().start()
+    return _registry
+
+
+def stop_registry():
+    """Stops the shared InterfaceRegistry"""
+    global _registry
+    if _registry is not None:
+        _registry.close()
+        _registry = None
 
 
 def get_interfaces() -> list:
     """Returns a list with all network interfaces"""
-    res = []
-    for item in _get_stat().keys():
-        res.append(item)
-    return res
+    if _registry is not None:
+        return list(_registry.interfaces())
+    return list(_get_stat().keys())
+
+
+def _get_sys_value(interface: str, file: str) -> str:
+    try:
+        with open("%s%s/%s" % (_SYS_NET_PTH, interface, file), "r") as f:
+            return f.read()[:-1]
+    except FileNotFoundError:
+        raise ValueNotFoundError(interface, _PROC_STAT, errno.ENODEV)
 
 
 def get_address(interface: str) -> str:
     """Returns MAC address assigned to a network interface"""
-    with open("%s%s/%s" % (_SYS_NET_PTH, _check_interface(interface, _get_stat()), "address"), "r") as file:
-        return file.read()[:-1]
+    if _registry is not None:
+        return _registry[interface].address
+    return _get_sys_value(interface, "address")
 
 
 def get_state(interface: str) -> str:
     """Returns operational state of a network interface (up, down, unknown, dormant, etc)"""
-    with open("%s%s/%s" % (_SYS_NET_PTH, _check_interface(interface, _get_stat()), "operstate"), "r") as file:
-        return file.read()[:-1]
+    if _registry is not None:
+        return _registry[interface].operstate
+    return _get_sys_value(interface, "operstate")
+
+
+def counters(interface: str) -> NetCounters:
+    """Returns a namedtuple with all the counters of /proc/net/dev of the given interface
+
+        rx_bytes, rx_packets, rx_errs, rx_drop, rx_fifo, rx_frame, rx_compressed, rx_multicast,
+        tx_bytes, tx_packets, tx_errs, tx_drop, tx_fifo, tx_colls, tx_carrier and tx_compressed
+
+        :Params:
+            :interface (str): Interface name
+
+    """
+    stat = _get_stat((interface,))
+    return stat[_check_interface(interface, stat)]
 
 
 def download_bytes(interface: str, scale="bytes", precision=2):
@@ -173,3 +483,23 @@ def down_up_speed(interface: str, interval=0.0, scale="bytes", precision=2):
     stat = _set_delta(interface, interval)
     return set_bytes(stat[0], stat[1], scale_in="bytes", scale_out=scale, precision=precision)
 
+
+async def adownload_speed(interface: str, interval=0.0, scale="bytes", precision=2):
+    """Coroutine version of download_speed(). It waits with asyncio.sleep()"""
+    return set_bytes((await _aset_delta(interface, interval))[0], scale_in="bytes", scale_out=scale,
+                     precision=precision)
+
+
+async def aupload_speed(interface: str, interval=0.0, scale="bytes", precision=2):
+    """Coroutine version of upload_speed(). It waits with asyncio.sleep()"""
+    return set_bytes((await _aset_delta(interface, interval))[1], scale_in="bytes", scale_out=scale,
+                     precision=precision)
+
+
+async def adown_up_speed(interface: str, interval=0.0, scale="bytes", precision=2):
+    """Coroutine version of down_up_speed(). It waits with asyncio.sleep()
+
+    Concurrent awaiters asking for the same interval share the reads of /proc/net/dev
+    """
+    stat = await _aset_delta(interface, interval)
+    return set_bytes(stat[0], stat[1], scale_in="bytes", scale_out=scale, precision=precision)
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+import errno
+from collections import namedtuple
+from statux._errors import ValueNotFoundError, ex_handler
+from statux._reader import get_reader, read
+from statux._sampler import Sampler
+from statux.cpu import _get_cpu_block, _parse_cpu_list, topology
+from statux.ram import MemInfo
+
+_SYS_NODE = "/sys/devices/system/node/"
+_ONLINE = "%sonline" % _SYS_NODE
+_MEMINFO = "%snode%d/meminfo"
+_NUMASTAT = "%snode%d/numastat"
+
+
+class NodeMemInfo(MemInfo):
+    """ Snapshot of /sys/devices/system/node/nodeN/meminfo
+
+    Same fields as MemInfo without the 'Node N' prefix. There is no MemAvailable, Buffers or Cached
+    per node: used is MemUsed and buff_cache is FilePages + Slab
+    """
+    __slots__ = ()
+
+    def __init__(self, data: bytes):
+        self.fields = {}
+        for line in data.splitlines():
+            name, value = line.split()[2:4]  # 'Node 0 MemTotal:       4161272 kB'
+            self.fields[name[:-1].decode()] = int(value)
+
+    def __repr__(self):
+        return "%s(total=%d, free=%d, used=%d)" % (self.__class__.__name__, self.total, self.free, self.used)
+
+    @property
+    def used(self) -> int:
+        return self["MemUsed"]
+
+    @property
+    def buff_cache(self) -> int:
+        return self["FilePages"] + self.slab
+
+
+NumaStat = namedtuple("NumaStat", "numa_hit numa_miss numa_foreign interleave_hit local_node other_node")
+NodeStat = namedtuple("NodeStat", "memory numastat load")
+
+
+def _parse_numastat(data: bytes) -> NumaStat:
+    values = dict(line.split() for line in data.splitlines())
+    return NumaStat._make(int(values.get(field.encode(), 0)) for field in NumaStat._fields)
+
+
+@ex_handler(_ONLINE, "NUMA nodes")
+def nodes() -> list:
+    """Returns a list with the online NUMA nodes"""
+    return _parse_cpu_list(read(_ONLINE).decode())
+
+
+def _check_node(node: int) -> int:
+    if node not in nodes():
+        raise ValueNotFoundError("node%s" % node, _SYS_NODE, errno.ENODEV,
+                                 msg="node%s not found in %s" % (node, _SYS_NODE))
+    return node
+
+
+@ex_handler(_SYS_NODE, "node meminfo")
+def meminfo(node: int) -> NodeMemInfo:
+    """Returns a NodeMemInfo snapshot of a NUMA node
+
+        :Params:
+            :node (int): NUMA node (Ex: 0)
+    """
+    return NodeMemInfo(read(_MEMINFO % (_SYS_NODE, _check_node(node))))
+
+
+@ex_handler(_SYS_NODE, "numastat")
+def numastat(node: int) -> NumaStat:
+    """Returns a NumaStat namedtuple with the allocation counters of a NUMA node
+
+        :Params:
+            :node (int): NUMA node (Ex: 0)
+    """
+    return _parse_numastat(read(_NUMASTAT % (_SYS_NODE, _check_node(node))))
+
+
+class NodeSampler(Sampler):
+    """ Class to get memory, NUMA allocation rates and CPU load of every NUMA node
+
+            :Params:
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    next_value() returns a dict with a NodeStat namedtuple per node:
+
+        memory:   NodeMemInfo snapshot
+        numastat: NumaStat with events per second (numa_hit, numa_miss, numa_foreign...)
+        load:     CPU load percentage of the cpus of the node
+
+    The meminfo and numastat files of every node are opened when the sampler is created, so every
+    sample is one sweep that reads /proc/stat once and each node file once. The rows of /proc/stat
+    of every node are computed again only after a CPU hotplug.
+    """
+    def __init__(self, initialize=False):
+        self.nodes = nodes()
+        self._paths = [(node, _MEMINFO % (_SYS_NODE, node), _NUMASTAT % (_SYS_NODE, node)) for node in self.nodes]
+        for _, memory, stat in self._paths:  # Opened once, they are kept open by the shared readers
+            get_reader(memory), get_reader(stat)
+        self._topology = None
+        self._rows = {}     # node -> rows of /proc/stat
+        super().__init__(initialize)
+
+    def _update_rows(self):
+        topology_ = topology()
+        if topology_ is not self._topology:
+            self._topology = topology_
+            row = {cpu: i + 1 for i, cpu in enumerate(sorted(topology_.cpus))}  # Row 0 is the aggregate line
+            self._rows = {node: [row[cpu] for cpu in cpus] for node, cpus in topology_.node_cpus().items()}
+
+    def _get_stat(self) -> tuple:
+        # -> tuple: (cpu block, {node: (meminfo bytes, numastat bytes)})
+        return _get_cpu_block(), {node: (read(memory), read(stat)) for node, memory, stat in self._paths}
+
+    def _load(self, old_block: tuple, new_block: tuple, rows: list, precision: int) -> float:
+        (_, columns, old_stat), (_, new_columns, new_stat) = old_block, new_block
+        if len(old_stat) != len(new_stat) or columns != new_columns:  # CPU hotplug
+            return 0.0
+        total = active = 0
+        for row in rows:
+            start = row * columns
+            if start + columns > len(new_stat):
+                continue
+            delta = [n - o for n, o in zip(new_stat[start:start + columns], old_stat[start:start + columns])]
+            total += sum(delta)
+            active += sum(delta) - delta[3] - delta[4]  # Idle and iowait are inactive time
+        return round(active / total * 100, precision) if total else 0.0
+
+    @ex_handler(_SYS_NODE, "NUMA nodes")
+    def next_value(self, interval=0.0, precision=2) -> dict:
+        """Returns a dict with NUMA nodes as keys and NodeStat namedtuples as values
+
+            :Params:
+                :interval (float): Seconds. When value is greater than zero, it returns rates and load
+                                   in that period of time. When interval value is 0, it returns rates
+                                   and load since the last call
+                :precision  (int): Number of rounding decimals
+
+        """
+        (old_block, old_nodes), (new_block, new_nodes), elapsed = self._get_pair(interval)
+        self._update_rows()
+        res = {}
+        for node in self.nodes:
+            memory, stat = new_nodes[node]
+            old, new = _parse_numastat(old_nodes[node][1]), _parse_numastat(stat)
+            rates = NumaStat._make(round((n - o) / elapsed, precision) if elapsed else 0.0 for n, o in zip(new, old))
+            res[node] = NodeStat(NodeMemInfo(memory), rates, self._load(old_block, new_block,
+                                                                        self._rows.get(node, []), precision))
+        return res
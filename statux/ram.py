@@ -16,70 +16,155 @@
 
 from statux._conversions import set_bytes
 from statux._errors import ValueNotFoundError, ex_handler
+from statux._reader import read
 
 _MEMINFO = "/proc/meminfo"
 
 
-def _get_val(*items) -> list:
-    with open(_MEMINFO, "rb") as file:
-        values = []
-        indices = []
-        l_items = len(items)
-        for line in file:
-            for i, value in enumerate(items):
-                if line.startswith(value):
-                    values.insert(i, int(line.split()[-2]))
-                    indices.append(i)
-            if len(values) == l_items:
-                break
-        if len(values) != l_items:
-            not_found = [items[k].decode() for k in [j for j in list(range(l_items)) if j not in indices]]
-            raise ValueNotFoundError(", ".join(not_found), _MEMINFO, 61)
-        return values
+class MemInfo:
+    """ Snapshot of /proc/meminfo. The file is read and parsed once, when the object is created
+
+            :Params:
+                :data (bytes): Content of /proc/meminfo. If it's None the file is read
+
+
+    Every field is available by its meminfo name (e.g.: info["Dirty"], info["HugePages_Total"]).
+    Values are in KiB, except HugePages_* fields that are counts of pages. Properties return the
+    usual fields and the derived metrics, so several metrics can be taken from the same read.
+    """
+    __slots__ = ("fields",)
+
+    def __init__(self, data=None):
+        self.fields = {}
+        for line in (read(_MEMINFO) if data is None else data).splitlines():
+            name, value = line.split()[:2]
+            self.fields[name[:-1].decode()] = int(value)
+
+    def __getitem__(self, name: str) -> int:
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise ValueNotFoundError(name, _MEMINFO, 61)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def __repr__(self):
+        return "%s(total=%d, available=%d, used=%d, swap_used=%d)" % (
+            self.__class__.__name__, self.total, self.available, self.used, self.swap_used)
+
+    # Fields (KiB)
+    total = property(lambda self: self["MemTotal"])
+    free = property(lambda self: self["MemFree"])
+    available = property(lambda self: self["MemAvailable"])
+    buffers = property(lambda self: self["Buffers"])
+    cached = property(lambda self: self["Cached"])
+    slab = property(lambda self: self["Slab"])
+    shmem = property(lambda self: self["Shmem"])
+    dirty = property(lambda self: self["Dirty"])
+    writeback = property(lambda self: self["Writeback"])
+    committed_as = property(lambda self: self["Committed_AS"])
+    commit_limit = property(lambda self: self["CommitLimit"])
+    swap_total = property(lambda self: self["SwapTotal"])
+    swap_free = property(lambda self: self["SwapFree"])
+    swap_cached = property(lambda self: self["SwapCached"])
+    hugepage_size = property(lambda self: self["Hugepagesize"])
+    hugepages_total = property(lambda self: self["HugePages_Total"])
+    hugepages_free = property(lambda self: self["HugePages_Free"])
+
+    # Derived metrics
+    @property
+    def buff_cache(self) -> int:
+        """Buffers + Cached + SReclaimable + SUnreclaim (KiB)"""
+        return self.buffers + self.cached + self["SReclaimable"] + self["SUnreclaim"]
+
+    @property
+    def used(self) -> int:
+        """Total - (Free + Buffers + Cached + Slab) (KiB)"""
+        return self.total - (self.free + self.buffers + self.cached + self.slab)
+
+    @property
+    def swap_used(self) -> int:
+        """SwapTotal - SwapFree (KiB)"""
+        return self.swap_total - self.swap_free
+
+    @property
+    def hugepages_used(self) -> int:
+        """HugePages_Total - HugePages_Free (pages)"""
+        return self.hugepages_total - self.hugepages_free
+
+    def _percent(self, value, total_, precision):
+        return round(value / total_ * 100, precision) if total_ else 0.0
+
+    def free_percent(self, precision=2) -> float:
+        return self._percent(self.free, self.total, precision)
+
+    def available_percent(self, precision=2) -> float:
+        return self._percent(self.available, self.total, precision)
+
+    def used_percent(self, precision=2) -> float:
+        return self._percent(self.used, self.total, precision)
+
+    def swap_used_percent(self, precision=2) -> float:
+        return self._percent(self.swap_used, self.swap_total, precision)
+
+    def commit_percent(self, precision=2) -> float:
+        """Committed_AS / CommitLimit percentage. It can be greater than 100 (overcommit)"""
+        return self._percent(self.committed_as, self.commit_limit, precision)
+
+
+@ex_handler(_MEMINFO)
+def meminfo() -> MemInfo:
+    """Returns a MemInfo snapshot with every field of /proc/meminfo
+
+    The functions of this module accept it as snapshot param, so several values can be taken from
+    a single read. E.g.: info = meminfo(); used(snapshot=info); used_percent(snapshot=info)
+    """
+    return MemInfo()
 
 
 @ex_handler(_MEMINFO)
-def total(scale="MiB", precision=2):
+def total(scale="MiB", precision=2, snapshot=None):
     """Returns total RAM memory size
 
         :Params:
             :scale     (str): Chosen scale (bytes, KiB, MiB, GiB, TiB, kB, MB, GB, TB or auto)
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
     """
-    total_ = _get_val(b"MemTotal")[0]
-    return set_bytes(total_, scale_out=scale, precision=precision)
+    return set_bytes((snapshot or MemInfo()).total, scale_out=scale, precision=precision)
 
 
 @ex_handler(_MEMINFO)
-def free(scale="MiB", precision=2):
+def free(scale="MiB", precision=2, snapshot=None):
     """Returns free RAM
 
         :Params:
             :scale     (str): Chosen scale (bytes, KiB, MiB, GiB, TiB, kB, MB, GB, TB or auto)
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
     """
-    free_ = _get_val(b"MemFree")[0]
-    return set_bytes(free_, scale_out=scale, precision=precision)
+    return set_bytes((snapshot or MemInfo()).free, scale_out=scale, precision=precision)
 
 
 @ex_handler(_MEMINFO)
-def free_percent(precision=2) -> float:
+def free_percent(precision=2, snapshot=None) -> float:
     """Returns free RAM percent
 
      The amount of memory which is currently not used for anything
 
         :Params:
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
     """
-    free_, total_ = _get_val(b"MemFree", b"MemTotal")
-    return round(free_ / total_ * 100, precision)
+    return (snapshot or MemInfo()).free_percent(precision)
 
 
 @ex_handler(_MEMINFO)
-def available(scale="MiB", precision=2):
+def available(scale="MiB", precision=2, snapshot=None):
     """Returns available RAM
 
     The amount of RAM which is available for allocation to a new process or to existing processes
@@ -87,61 +172,58 @@ def available(scale="MiB", precision=2):
         :Params:
             :scale     (str): Chosen scale (bytes, KiB, MiB, GiB, TiB, kB, MB, GB, TB or auto)
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
         """
-    available_ = _get_val(b"MemAvailable")[0]
-    return set_bytes(available_, scale_out=scale, precision=precision)
+    return set_bytes((snapshot or MemInfo()).available, scale_out=scale, precision=precision)
 
 
 @ex_handler(_MEMINFO)
-def available_percent(precision=2) -> float:
+def available_percent(precision=2, snapshot=None) -> float:
     """Returns available RAM percent
 
     The amount of RAM which is available for allocation to a new process or to existing processes
 
         :Params:
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
         """
-    available_, total_ = _get_val(b"MemAvailable", b"MemTotal")
-    return round(available_ / total_ * 100, precision)
+    return (snapshot or MemInfo()).available_percent(precision)
 
 
 @ex_handler(_MEMINFO)
-def buff_cache(scale="MiB", precision=2):
+def buff_cache(scale="MiB", precision=2, snapshot=None):
     """Returns buffers, cached and slab memory
 
         :Params:
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
     """
-    items = (b"Buffers", b"Cached", b"SReclaimable", b"SUnreclaim")
-    buff, cache, sre, sur = map(float, _get_val(*items))
-    return set_bytes(buff + cache + sre + sur, scale_out=scale, precision=precision)
+    return set_bytes((snapshot or MemInfo()).buff_cache, scale_out=scale, precision=precision)
 
 
 @ex_handler(_MEMINFO)
-def used(scale="MiB", precision=2):
+def used(scale="MiB", precision=2, snapshot=None):
     """Returns used RAM memory
 
     Used = Total - (Free + Buffers + Cached + Slab)
 
         :Params:
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
     """
-    items = (b"MemTotal", b"MemFree", b"Buffers", b"Cached", b"Slab")
-    tot, free_, buff, cached, slab = map(float, _get_val(*items))
-    return set_bytes(tot - (buff + cached + slab + free_), scale_out=scale, precision=precision)
+    return set_bytes((snapshot or MemInfo()).used, scale_out=scale, precision=precision)
 
 
 @ex_handler(_MEMINFO)
-def used_percent(precision=2):
+def used_percent(precision=2, snapshot=None):
     """Returns used RAM percentage
 
         :Params:
             :precision (int): Number of rounding decimals
+            :snapshot (MemInfo): Snapshot to take the value from. If it's None, /proc/meminfo is read
 
     """
-    items = (b"MemTotal", b"MemFree", b"Buffers", b"Cached", b"Slab")
-    tot, free_, buff, cache, slab = map(float, _get_val(*items))
-    return round((tot - buff - cache - slab - free_) / tot * 100, precision)
+    return (snapshot or MemInfo()).used_percent(precision)
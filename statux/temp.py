@@ -14,43 +14,86 @@
 # (ɔ) Iván Rincón 2019
 
 
-from os import listdir
-from os.path import join, exists
+from os.path import dirname
 from statux._conversions import set_celsius
-from statux._errors import TempNotFoundError, ValueNotFoundError
-
-_PTH1 = "/sys/devices/platform/coretemp.0/hwmon/"
-_PTH2 = "/sys/class/hwmon/"
-_PARENT = _PTH1 if exists(_PTH1) else _PTH2  # in some AMD _PTH1 doesn't exist
-_HWMON = "hwmon"
-
-
-def _get_stat():
-    # Look for temp#* files in hwmon folders and associate labels with their inputs.
-    # E.g. temp1_label.read() = "Package id 0" and temp1_input.read() = "4500"
-    #      temp2_label.read() = "Core 0"       and temp2_input.read() = "4100"
-    #      will return {"Core 0": 41000, 'Package id 0': 45000}
-    res = {}
-    err = None
-    for hwmon in listdir(_PARENT):
-        for file in listdir(join(_PARENT, hwmon)):
-            if file.endswith("label"):
-                path_l = join(_PARENT, hwmon, file)
-                with open(path_l, "rb") as file_l:
-                    label = file_l.readline()[:-1].decode()
-                    path_i = path_l.replace("label", "input")
-                    try:
-                        with open(path_i, "rb") as file_i:
-                            res[label] = int(file_i.readline()[:-1])
-                    except ValueError:
-                        err = 42
-                    except FileNotFoundError:
-                        err = 2
-                    finally:
-                        if err is not None:
-                            raise ValueNotFoundError("%s value" % label, path_i, err)
-
-    return res
+from statux._errors import TempNotFoundError, ex_handler
+from statux._reader import on_close
+from statux.hwmon import HwmonIndex, _sort_key
+
+_PARENT = "/sys/class/hwmon/"
+_CORETEMP = "coretemp"  # Intel. One chip per package: coretemp.0, coretemp.1...
+_PACKAGE_LABELS = ("Tdie", "Tctl")  # AMD k10temp doesn't have a sensor per core
+
+# Cache:
+_sensors = None
+
+
+class SensorIndex(HwmonIndex):
+    """ Index of the temperature sensors of every hwmon chip
+
+    It's built once: each temp*_input file is mapped to its chip (hwmon name file) and its label
+    (temp*_label, or 'temp1', 'temp2', etc if the sensor has no label) and its descriptor is kept
+    open, so read() is a batch of preads that returns a list of millidegree values in the order
+    of sensors (None if a sensor can't be read, e.g. a suspended GPU or a sleeping disk). Use
+    sensor_index() to get the index, it's rebuilt when hwmon directories change.
+
+    If there are coretemp chips, only their sensors are indexed (every package has its own chip).
+    Otherwise (e.g. AMD) the sensors of every chip are indexed.
+
+    core_sensors maps (package id, core id) to the position of the coretemp 'Core N' sensors and
+    (package id, None) to 'Package id N' (or AMD Tdie/Tctl) sensors. The ids are the same as
+    /sys/devices/system/cpu/cpu*/topology/physical_package_id and core_id.
+    """
+    def __init__(self):
+        super().__init__(_PARENT, kinds=("temp",), thermal=False)
+        if any(sensor.chip == _CORETEMP for sensor in self.sensors):
+            for sensor, reader in zip(self.sensors, self._readers):
+                sensor.chip != _CORETEMP and reader.close()
+            self.sensors, self._readers = map(list, zip(*((sensor, reader) for sensor, reader
+                                                         in zip(self.sensors, self._readers)
+                                                         if sensor.chip == _CORETEMP)))
+        self.core_sensors = {}
+        chips = {}  # hwmon directory -> [(label, position)]
+        for position, sensor in enumerate(self.sensors):
+            chips.setdefault(dirname(sensor.input), []).append((sensor.label, position))
+        ordinal = 0  # Package of chips without 'Package id N' label (one chip per package)
+        for chip in sorted(chips, key=_sort_key):
+            labels = dict(chips[chip])
+            package = next((int(label[11:]) for label in labels if label.startswith("Package id ")), None)
+            cores_ = {int(label[5:]): position for label, position in labels.items()
+                      if label.startswith("Core ") and label[5:].isdigit()}
+            if package is None:
+                found = [labels[label] for label in _PACKAGE_LABELS if label in labels]
+                if not found and not cores_:
+                    continue
+                package = ordinal
+                found and self.core_sensors.setdefault((package, None), found[0])
+            else:
+                self.core_sensors[package, None] = labels["Package id %d" % package]
+            ordinal += 1
+            self.core_sensors.update(((package, core), position) for core, position in cores_.items())
+
+    def values(self) -> dict:
+        """Returns a dict with (chip, label) as keys and millidegrees Celsius (or None) as values"""
+        return {(sensor.chip, sensor.label): value for sensor, value in zip(self.sensors, self.read())}
+
+
+@ex_handler(_PARENT, "temperature sensors")
+def sensor_index() -> SensorIndex:
+    """Returns the cached SensorIndex. It's rebuilt when a hwmon directory is added or removed"""
+    global _sensors
+    if _sensors is None or not _sensors.is_current():
+        _sensors is not None and _sensors.close()
+        _sensors = SensorIndex()
+    return _sensors
+
+
+@on_close
+def _close_index():
+    # Closes the descriptors of the cached SensorIndex (called by statux.close())
+    global _sensors
+    _sensors is not None and _sensors.close()
+    _sensors = None
 
 
 def cores(scale="celsius", precision=2) -> list:
@@ -60,9 +103,11 @@ def cores(scale="celsius", precision=2) -> list:
         :scale     (str): Return scale Celsius, Fahrenheit, Kelvin or Rankine)
         :precision (int): Number of rounding decimals
     """
-    stat = _get_stat()
-    if len(stat) > 0:
-        return [set_celsius(stat[key], scale, precision) for key in sorted(stat) if key.startswith("Core")]
+    index = sensor_index()
+    stat = index.read()
+    keys = sorted(key for key in index.core_sensors if key[1] is not None)  # Natural order (package, core)
+    if len(keys) > 0:
+        return [set_celsius(index._required(stat, index.core_sensors[key]), scale, precision) for key in keys]
     raise TempNotFoundError("cores", "cores temp values not found")
 
 
@@ -73,10 +118,11 @@ def cpu(scale="celsius", precision=2) -> float:
         :scale     (str): Return scale Celsius, Fahrenheit, Kelvin or Rankine)
         :precision (int): Number of rounding decimals
     """
-    stat = _get_stat()
-    for key in stat:
-        if " id" in key:
-            return set_celsius(stat[key], scale, precision)
+    index = sensor_index()
+    stat = index.read()
+    for position, sensor in enumerate(index.sensors):
+        if " id" in sensor.label:
+            return set_celsius(index._required(stat, position), scale, precision)
     raise TempNotFoundError("package id")
 
 
@@ -87,7 +133,7 @@ def max_val(scale="celsius", precision=2) -> float:
         :scale     (str): Return scale Celsius, Fahrenheit, Kelvin or Rankine)
         :precision (int): Number of rounding decimals
     """
-    stat = _get_stat()
+    stat = [value for value in sensor_index().read() if value is not None]
     if len(stat) > 0:
-        return set_celsius(max(stat.values()), scale, precision)
+        return set_celsius(max(stat), scale, precision)
     raise TempNotFoundError("max value", "no temp value found")
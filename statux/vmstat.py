@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# GNU General Public License v3.0
+#
+# Permissions of this strong copyleft license are conditioned on making available
+# complete source code of licensed works and modifications, which include larger works
+# using a licensed work, under the same license. Copyright and license notices must be
+# preserved. Contributors provide an express grant of patent rights.
+#
+# For more information on this, and how to apply and follow theGNU GPL, see:
+# http://www.gnu.org/licenses
+#
+# (ɔ) Iván Rincón 2019
+
+import errno
+from array import array
+from statux._errors import ValueNotFoundError, ex_handler
+from statux._reader import read
+from statux._sampler import Sampler
+
+_VMSTAT = "/proc/vmstat"
+
+# Counters summed up when they are requested by the name of the group (recent kernels split them)
+_GROUPS = {
+    "pgscan": ("pgscan_kswapd", "pgscan_direct", "pgscan_khugepaged", "pgscan_proactive"),
+    "pgsteal": ("pgsteal_kswapd", "pgsteal_direct", "pgsteal_khugepaged", "pgsteal_proactive"),
+    "allocstall": ("allocstall_dma", "allocstall_dma32", "allocstall_normal", "allocstall_movable",
+                   "allocstall_device"),
+}
+_DEFAULT = ("pgmajfault", "pswpin", "pswpout", "pgscan", "pgsteal", "allocstall", "oom_kill")
+
+# Cache:
+_keys = ()    # Names of /proc/vmstat lines, in file order
+_index = {}   # name -> index in the array returned by _get_vmstat
+
+
+def _get_vmstat() -> array:
+    # Returns an array with the values of /proc/vmstat in file order. The names are only parsed on
+    # the first read (or if the number of lines changes)
+    global _keys, _index
+    tokens = read(_VMSTAT).split()
+    values = array("q", map(int, tokens[1::2]))
+    if len(values) != len(_keys):
+        _keys = tuple(key.decode() for key in tokens[0::2])
+        _index = {key: i for i, key in enumerate(_keys)}
+    return values
+
+
+def _get_indices(name: str) -> tuple:
+    # Returns the indices of a counter (several in a group, e.g.: 'pgscan')
+    if name in _index:
+        return _index[name],
+    indices = tuple(_index[key] for key in _GROUPS.get(name, ()) if key in _index)
+    if not indices:
+        raise ValueNotFoundError(name, _VMSTAT, errno.ENODATA)
+    return indices
+
+
+@ex_handler(_VMSTAT)
+def keys() -> tuple:
+    """Returns a tuple with the names of the counters of /proc/vmstat"""
+    _keys or _get_vmstat()
+    return _keys
+
+
+@ex_handler(_VMSTAT)
+def counters(*names: str) -> dict:
+    """ Returns a dict with the current values of some /proc/vmstat counters
+
+        :Params:
+            :names (str): Counters names (Ex: 'pgmajfault', 'oom_kill'). Group names 'pgscan',
+                          'pgsteal' and 'allocstall' add up their counters. If none is given,
+                          pgmajfault, pswpin, pswpout, pgscan, pgsteal, allocstall and oom_kill
+    """
+    stat = _get_vmstat()
+    return {name: sum(stat[i] for i in _get_indices(name)) for name in names or _DEFAULT}
+
+
+class VmStat(Sampler):
+    """ Class to get paging and reclaim activity (per second rates of /proc/vmstat counters)
+
+            :Params:
+                :names       (str): Counters names (Ex: 'pgmajfault', 'pswpin', 'nr_dirtied'). Group
+                                    names 'pgscan', 'pgsteal' and 'allocstall' add up their counters.
+                                    If none is given: pgmajfault, pswpin, pswpout, pgscan, pgsteal,
+                                    allocstall and oom_kill
+                :initialize (bool): When initialize is True, the first snapshot is taken, so
+                                    next_value(interval=0) returns a real value the first time
+
+
+    /proc/vmstat is read once per sample into an array, and the indices of the selected counters
+    are resolved once, so every sample only subtracts some items of two arrays.
+    """
+    _source = _VMSTAT
+    _read_all = staticmethod(_get_vmstat)
+
+    def __init__(self, *names: str, initialize=False):
+        self.names = names or _DEFAULT
+        self._plan = None  # (number of counters, ((name, indices), ...))
+        super().__init__(initialize)
+
+    def _get_stat(self) -> array:
+        return _get_vmstat()
+
+    def _rates(self, old_stat: array, new_stat: array, elapsed: float, precision: int) -> dict:
+        if len(old_stat) != len(new_stat):  # Counters have changed. There isn't a previous value
+            old_stat = new_stat
+        if self._plan is None or self._plan[0] != len(new_stat):
+            self._plan = len(new_stat), tuple((name, _get_indices(name)) for name in self.names)
+        return {name: round(sum(new_stat[i] - old_stat[i] for i in indices) / elapsed, precision) if elapsed else 0.0
+                for name, indices in self._plan[1]}
+
+    @ex_handler(_VMSTAT, "vmstat")
+    def next_value(self, interval=0.0, precision=2) -> dict:
+        """Returns a dict with the rate per second of each counter
+
+            :Params:
+                :interval (float): Seconds. When value is greater than zero, it returns rates in
+                                   that period of time. When interval value is 0, it returns
+                                   rates since the last call
+                :precision  (int): Number of rounding decimals
+
+        """
+        return self._rates(*self._get_pair(interval), precision)
+
+    @ex_handler(_VMSTAT, "vmstat")
+    async def anext_value(self, interval=0.0, precision=2) -> dict:
+        """Coroutine version of next_value(). It waits with asyncio.sleep()"""
+        return self._rates(*await self._aget_pair(interval), precision)
@@ -0,0 +1,38 @@
+import signal
+import subprocess
+import sys
+import unittest
+from statux._reader import Reader, read_once
+
+
+class ReaderTest(unittest.TestCase):
+    # seq_file files return about one page per read, so Reader must keep reading until EOF
+    def test_seq_file_larger_than_a_page(self):
+        # smaps of a stopped child: its mappings don't change between the reads
+        child = subprocess.Popen([sys.executable, "-c", "import time; print(flush=True); time.sleep(30)"],
+                                 stdout=subprocess.PIPE)
+        try:
+            child.stdout.readline()  # Started
+            child.send_signal(signal.SIGSTOP)
+            path = "/proc/%d/smaps" % child.pid
+            with Reader(path, 64) as reader:
+                data = reader.read()
+            expected = read_once(path)
+        finally:
+            child.kill()
+            child.wait()
+            child.stdout.close()
+        self.assertGreater(len(data), 4096)
+        # One VmFlags line per mapping: the last mappings are lost if the file is truncated
+        self.assertEqual(data.count(b"VmFlags"), expected.count(b"VmFlags"))
+        self.assertEqual(data.count(b"\n"), expected.count(b"\n"))
+
+    def test_reread_from_offset_zero(self):
+        with Reader("/proc/self/mountinfo", 16) as reader:
+            first, second = reader.read(), reader.read()
+        self.assertEqual(first, second)
+        self.assertEqual(first, read_once("/proc/self/mountinfo"))
+
+
+if __name__ == "__main__":
+    unittest.main()